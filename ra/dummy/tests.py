@@ -73,9 +73,7 @@ class DummyCommonTest(ResourceAgentTest):
 
 class Start(DummyCommonTest):
     '''Start a dummy resource'''
-    def __init__(self, cm):
-        DummyCommonTest.__init__(self, cm)
-        self.name = "Start"
+    name = "Start"
 
     def test(self, target):
         # setup_test has created the inactive resource
@@ -95,8 +93,7 @@ class Start(DummyCommonTest):
         # bundles run OCF resources on bundle nodes, not host nodes
         name = rsc["ocf_name"]
         target_nodes = self.resource_target_nodes(rsc, self.Env["nodes"])
-        patterns = [self.ratemplates.build("Pat:RscRemoteOp", "start", name, n, 'ok')
-                    for n in target_nodes]
+        patterns = self.ratemplates.build("Pat:RscRemoteOps", "start", name, target_nodes, 'ok')
         watch = self.make_watch(patterns)
         self.rsh_check(target, "pcs resource enable %s" % rsc["name"])
         watch.look()
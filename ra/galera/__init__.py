@@ -1,13 +1,18 @@
-from .scenarios import scenarios
-from . import tests as t
-# import .tests_node
-# import .tests_sst
-# import galeratests_unmanaged
+# the scenarios and tests are only imported when the module
+# is chosen, see racts.racatalog.RAModule
+__all__ = ["name", "manifest"]
 
-__all__ = [ "tests", "scenarios", "name" ]
-tests = t.tests
-# + \
-#         tests_node.tests + \
-#         tests_sst.tests # + \
-        # galeratests_unmanaged.tests
 name = "Galera"
+manifest = {
+    "scenarios": ["SimpleSetup", "BundleSetup", "TLSSetup"],
+    # not enabled yet: tests_node, tests_sst, tests_unmanaged
+    "tests": [
+        "ClusterStart",
+        "ClusterStop",
+        "ClusterBootWithoutGrastateOnDisk",
+        "ClusterRestartAfter2RecoveredNodes",
+        "ClusterRestartAfterAllNodesRecovered"
+    ],
+    # other RA modules whose scenarios or tests are reused
+    "requires": [],
+}
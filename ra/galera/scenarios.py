@@ -26,20 +26,7 @@ Licensed under the GNU GPL.
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
 
 
-import sys, signal, time, os, re, string, subprocess, tempfile
-from stat import *
-from cts import CTS
-from cts.CTS import CtsLab
-from cts.CTStests import CTSTest
-# from cts.CM_ais import crm_mcp
-from cts.CTSscenarios import *
-from cts.CTSaudits import *
-from cts.CTSvars   import *
-from cts.patterns  import PatternSelector
-from cts.logging   import LogFactory
-from cts.remote    import RemoteFactory
-from cts.watcher   import LogWatcher
-from cts.environment import EnvFactory
+import os
 
 from racts.rascenario import RATesterScenarioComponent
 from racts.raconfig import RAConfig
@@ -99,7 +86,7 @@ class PrepareCluster(RATesterScenarioComponent):
         else:
             gcomm="gcomm://"+(",".join(cluster_nodes))
 
-        for node in cluster_nodes:
+        def setup_node_config(node):
             if bool(config["ipv6"]):
                 ip = "["+self.node_ipv6(node)+"]"
                 shortname = self.node_fqdn_ipv6(node)
@@ -124,9 +111,11 @@ class PrepareCluster(RATesterScenarioComponent):
                                   "%RSYNC%": rsync,
                                   "%TLSTUNNEL%": tlstunnel
                               })
+        self.run_on_nodes(setup_node_config, cluster_nodes)
         if bool(config["tls"]):
             self.log("Generating certificates for TLS")
-            for node in cluster_nodes:
+
+            def generate_certificate(node):
                 if bool(config["ipv6"]):
                     ca_node = self.node_fqdn_ipv6(node)
                 else:
@@ -136,22 +125,28 @@ class PrepareCluster(RATesterScenarioComponent):
                 self.rsh_check(node, "openssl req -new -key /tls/mysql.key -x509 -days 365000"
                                " -subj \"/CN=%s\" -out /tls/mysql.crt -batch"%ca_node)
                 self.rsh_check(node, "sh -c 'cat /tls/mysql.key /tls/mysql.crt > /tls/mysql.pem'")
+            self.run_on_nodes(generate_certificate, cluster_nodes)
             self.log("Generating a common CA file for TLS")
             if bool(config["ipv6"]):
                 ca_nodes = " ".join([self.node_fqdn_ipv6(n) for n in cluster_nodes])
             else:
                 ca_nodes = " ".join([self.node_fqdn(n) for n in cluster_nodes])
-            for node in cluster_nodes:
+
+            def collect_certificates(node):
                 self.rsh_check(node, "for n in %s; do ssh -o StrictHostKeyChecking=no $n 'cat /tls/mysql.crt'"
                                ">> /tls/all-mysql.crt; done"%\
                                ca_nodes)
-            for node in cluster_nodes:
+            self.run_on_nodes(collect_certificates, cluster_nodes)
+
+            def chown_certificates(node):
                 self.rsh(node, "chown -R %s:%s /tls"%\
                          (config["user"],config["user"]))
+            self.run_on_nodes(chown_certificates, cluster_nodes)
 
     def setup_state(self, cluster_nodes):
         config=self.Env["config"]
-        for node in cluster_nodes:
+
+        def setup_node_state(node):
             # blank galera state on disk
             if not bool(config["skip_install_db"]):
                 self.log("recreating empty mysql database on node %s"%node)
@@ -167,6 +162,7 @@ class PrepareCluster(RATesterScenarioComponent):
             if bool(config["mariabackup"]):
                 self.log("Creating mariabackup user in DB on node %s"%node)
                 self.rsh(node, "mysqld_safe  --skip-networking --wsrep-provider=none & timeout 20 bash -c \"until mysqladmin ping 2>/dev/null; do sleep 1; done\"; mysql -e \"CREATE USER 'mariabackup'@'localhost' IDENTIFIED BY 'ratester'; GRANT RELOAD, PROCESS, LOCK TABLES, REPLICATION CLIENT ON *.* TO 'mariabackup'@'localhost';\"; mysqladmin shutdown")
+        self.run_on_nodes(setup_node_state, cluster_nodes)
 
 
 # The scenario below set up various configuration of the galera tests
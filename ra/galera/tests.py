@@ -26,20 +26,6 @@ Licensed under the GNU GPL.
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
 
-import sys, signal, time, os, re, string, subprocess, tempfile
-from stat import *
-from cts import CTS
-from cts.CTS import CtsLab
-from cts.CTStests import CTSTest
-from cts.CTSscenarios import *
-from cts.CTSaudits import *
-from cts.CTSvars   import *
-from cts.patterns  import PatternSelector
-from cts.logging   import LogFactory
-from cts.remote    import RemoteFactory
-from cts.watcher   import LogWatcher
-from cts.environment import EnvFactory
-
 from racts.ratest import ResourceAgentTest
 
 tests = []
@@ -93,6 +79,13 @@ class GaleraCommonTest(ResourceAgentTest):
             r"rsyncd.*:\s*rsync error: received SIGINT, SIGTERM, or SIGHUP"
         ]
 
+    def wait_until_gdb_attached(self, nodes, timeout=30):
+        # gdb traces mysqld, and resumed it once its breakpoints are set
+        check = "awk '/^State:/ {s=$2} /^TracerPid:/ {t=$2} END {exit !(t>0 && s!=\"t\")}' " \
+                "/proc/$(cat /var/run/mysql/mysqld.pid)/status"
+        late = self.wait_until(lambda n: self.rsh(n, check) == 0, nodes, timeout)
+        assert not late, "gdb did not attach to mysqld on %s" % ",".join(late)
+
     def errors_after_forced_stop(self):
         # after the node has been force-stopped, monitor op will fail and log
         return [
@@ -206,9 +199,7 @@ class GaleraCommonTest(ResourceAgentTest):
 
 class ClusterStart(GaleraCommonTest):
     '''Start the galera cluster on all the nodes'''
-    def __init__(self, cm):
-        GaleraCommonTest.__init__(self,cm)
-        self.name = "ClusterStart"
+    name = "ClusterStart"
 
     def test(self, target):
         '''Start an entire Galera cluster'''
@@ -228,12 +219,10 @@ class ClusterStart(GaleraCommonTest):
         # bundles run OCF resources on bundle nodes, not host nodes
         name = config["ocf_name"]
         target_nodes = self.resource_target_nodes(config, self.Env["nodes"])
-        patterns = [self.ratemplates.build("Pat:RscRemoteOp", "promote", name, n, 'ok') \
-                    for n in target_nodes]
-        watch = self.make_watch(patterns)
         self.rsh_check(self.Env["nodes"][0], "pcs resource enable %s"%config["name"])
-        watch.lookforall()
-        assert not watch.unmatched, watch.unmatched
+        # galera is promoted on all nodes once the cluster is up
+        self.cluster_manager.wait_for_resource_state(self.Env["nodes"][0], name, "Promoted",
+                                                     target_nodes, self.Env["DeadTime"])
 
 
 tests.append(ClusterStart)
@@ -241,9 +230,7 @@ tests.append(ClusterStart)
 
 class ClusterStop(ClusterStart):
     '''Stop the galera cluster'''
-    def __init__(self, cm):
-        GaleraCommonTest.__init__(self,cm)
-        self.name = "ClusterStop"
+    name = "ClusterStop"
 
     def test(self, dummy):
         # start cluster
@@ -254,8 +241,7 @@ class ClusterStop(ClusterStart):
         ## bundles run resources on container nodes, not host nodes
         if config["bundle"]:
             target_nodes=["galera-bundle-%d"%x for x in range(len(self.Env["nodes"]))]
-        patterns = [self.ratemplates.build("Pat:RscRemoteOp", "stop", "galera", n, 'ok') \
-                    for n in target_nodes]
+        patterns = self.ratemplates.build("Pat:RscRemoteOps", "stop", "galera", target_nodes, 'ok')
         watch = self.make_watch(patterns)
         self.rsh_check(self.Env["nodes"][0], "pcs resource disable %s"%config["name"])
         watch.lookforall()
@@ -276,9 +262,7 @@ class ClusterBootWithoutGrastateOnDisk(ClusterStart):
     '''Ensure that the cluster will boot even if no grastate.dat can
     be found on any of the nodes.
     '''
-    def __init__(self, cm):
-        GaleraCommonTest.__init__(self,cm)
-        self.name = "ClusterBootWithoutGrastateOnDisk"
+    name = "ClusterBootWithoutGrastateOnDisk"
 
     def test(self, target):
         for n in self.Env["nodes"]:
@@ -302,9 +286,7 @@ tests.append(ClusterBootWithoutGrastateOnDisk)
 
 class ClusterRestartAfter2RecoveredNodes(ClusterStart):
     '''Ensure cluster recovers after several nodes killed during a transaction'''
-    def __init__(self, cm):
-        GaleraCommonTest.__init__(self,cm)
-        self.name = "ClusterRestartAfter2RecoveredNodes"
+    name = "ClusterRestartAfter2RecoveredNodes"
 
     def is_applicable(self):
         # mariadb 10.1+ seems to be immune to pending XA
@@ -322,9 +304,7 @@ class ClusterRestartAfter2RecoveredNodes(ClusterStart):
         self.rsh_check(target, "mysql -e 'drop database if exists racts; drop table if exists racts.break; create database racts; create table racts.break (i int) engine=innodb;'");
         for node in to_break:
             self.rsh_bg(node, "gdb -x /tmp/kill-during-txn.gdb -p `cat /var/run/mysql/mysqld.pid`")
-
-        # racy sleep to allow gdb to engage
-        time.sleep(3)
+        self.wait_until_gdb_attached(to_break)
         self.rsh_check(target, "pcs resource unmanage galera")
 
         # kill two nodes died, the remaining will go Non-Primary
@@ -343,7 +323,7 @@ class ClusterRestartAfter2RecoveredNodes(ClusterStart):
         # ensure the bootstrap node is not a recovered one
         patterns = [r"Node <%s> is bootstrapping the cluster" % target] + \
                    [r"local node <%s> was not shutdown properly. Rollback stuck transaction with --tc-heuristic-recover"%node for node in to_break] + \
-                   [self.ratemplates.build("Pat:RscRemoteOp", "promote", "galera", node, 'ok') for node in self.Env["nodes"]]
+                   self.ratemplates.build("Pat:RscRemoteOps", "promote", "galera", self.Env["nodes"], 'ok')
         watch = self.make_watch(patterns)
         self.rsh_check(target, "pcs resource manage galera")
         watch.lookforall()
@@ -363,9 +343,7 @@ tests.append(ClusterRestartAfter2RecoveredNodes)
 
 class ClusterRestartAfterAllNodesRecovered(ClusterStart):
     '''Ensure cluster recovers after all nodes killed during a transaction!'''
-    def __init__(self, cm):
-        GaleraCommonTest.__init__(self,cm)
-        self.name = "ClusterRestartAfterAllNodesRecovered"
+    name = "ClusterRestartAfterAllNodesRecovered"
 
     def is_applicable(self):
         # mariadb 10.1+ seems to be immune to pending XA
@@ -384,9 +362,7 @@ class ClusterRestartAfterAllNodesRecovered(ClusterStart):
         self.rsh_check(target, "mysql -e 'drop database if exists racts; drop table if exists racts.break; create database racts; create table racts.break (i int) engine=innodb;'");
         for node in all_nodes:
             self.rsh_bg(node, "gdb -x /tmp/kill-during-txn.gdb -p `cat /var/run/mysql/mysqld.pid`")
-
-        # racy sleep to allow gdb to engage
-        time.sleep(3)
+        self.wait_until_gdb_attached(all_nodes)
 
         # Oh my! all the nodes broke in the middle of a transaction
         # this will make the SQL statement fail, and the bootstrap
@@ -394,7 +370,7 @@ class ClusterRestartAfterAllNodesRecovered(ClusterStart):
         # NOTE: bootstrapping a node which doesn't have grastate.dat
         # will result in the cluster's seqno to restart from 0
         patterns = [r"local node <%s> was not shutdown properly. Rollback stuck transaction with --tc-heuristic-recover"%node for node in all_nodes] + \
-                   [self.ratemplates.build("Pat:RscRemoteOp", "promote", "galera", node, 'ok') for node in all_nodes]
+                   self.ratemplates.build("Pat:RscRemoteOps", "promote", "galera", all_nodes, 'ok')
 
         watch = self.make_watch(patterns)
         self.rsh_check(target, "mysql -e 'insert into racts.break values (42);'", expected=1)
@@ -27,33 +27,22 @@ Licensed under the GNU GPL.
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
 
 
-import sys, signal, time, os, re, string, subprocess, tempfile
-from stat import *
-from cts import CTS
-from cts.CTS import CtsLab
-from cts.CTStests import CTSTest
-# from cts.CM_ais import crm_mcp
-from cts.CTSscenarios import *
-from cts.CTSaudits import *
-from cts.CTSvars   import *
-from cts.patterns  import PatternSelector
-from cts.logging   import LogFactory
-from cts.remote    import RemoteFactory
-from cts.watcher   import LogWatcher
-from cts.environment import EnvFactory
-
-from racts.ratest import ResourceAgentTest
+import time
+
+from racts.rafacts import CommandRc, FileContains
 
 from .galeratests import GaleraTest, ClusterStart
 
 tests = []
 
+GALERA_RA = "/usr/lib/ocf/resource.d/heartbeat/galera"
+# mariadb 10.1+ seems to be immune to pending XA
+MYSQL_5_5 = CommandRc("mysql --version | awk '{print $5}' | awk -F. '$1==5 && $2==5 {print 1}' | grep 1")
+
 
 class NodeForceStartBootstrap(GaleraTest):
     '''Force-bootstrap Galera on a single node'''
-    def __init__(self, cm):
-        GaleraTest.__init__(self,cm)
-        self.name = "NodeForceStartBootstrap"
+    name = "NodeForceStartBootstrap"
 
     def test(self, node):
         '''Ban all nodes except one, to block promotion to master, and force promote manually on one node.
@@ -75,8 +64,7 @@ class NodeForceStartBootstrap(GaleraTest):
         ## bundles run resources on container nodes, not host nodes
         if self.Env["galera_bundle"]:
             target_nodes=["galera-bundle-%d"%x for x in range(len(self.Env["nodes"]))]
-        patterns = [self.ratemplates.build("Pat:RscRemoteOp", "start", "galera", n, 'ok') \
-                    for n in target_nodes]
+        patterns = self.ratemplates.build("Pat:RscRemoteOps", "start", "galera", target_nodes, 'ok')
         watch = self.create_watch(patterns, self.Env["DeadTime"])
         watch.setwatch()
         self.rsh_check(target, "pcs resource enable %s"%self.Env["galera_rsc_name"])
@@ -135,9 +123,7 @@ tests.append(NodeForceStartBootstrap)
 
 class NodeForceStartJoining(ClusterStart):
     '''Force a node to join a Galera cluster'''
-    def __init__(self, cm):
-        GaleraTest.__init__(self,cm)
-        self.name = "NodeForceStartJoining"
+    name = "NodeForceStartJoining"
 
     def test(self, node):
         '''TODO'''
@@ -189,9 +175,7 @@ tests.append(NodeForceStartJoining)
 
 class NodeCheckDemoteCleanUp(GaleraTest):
     '''Ensure that a "demote" op cleans up galera attributes in the CIB'''
-    def __init__(self, cm):
-        GaleraTest.__init__(self,cm)
-        self.name = "NodeCheckDemoteCleanUp"
+    name = "NodeCheckDemoteCleanUp"
 
     def test(self, node):
         # note: for bundle we need to start the galera resource up to
@@ -211,8 +195,7 @@ class NodeCheckDemoteCleanUp(GaleraTest):
         ## bundles run resources on container nodes, not host nodes
         if self.Env["galera_bundle"]:
             target_nodes=["galera-bundle-%d"%x for x in range(len(self.Env["nodes"]))]
-        patterns = [self.ratemplates.build("Pat:RscRemoteOp", "start", "galera", n, 'ok') \
-                    for n in target_nodes]
+        patterns = self.ratemplates.build("Pat:RscRemoteOps", "start", "galera", target_nodes, 'ok')
         watch = self.create_watch(patterns, self.Env["DeadTime"])
         watch.setwatch()
         self.rsh_check(target, "pcs resource enable %s"%self.Env["galera_rsc_name"])
@@ -267,9 +250,7 @@ class NodeRestartOnErrorIfMaster(ClusterStart):
       * sync monitor sets master score when ist is over
       * pcmk calls promote
     '''
-    def __init__(self, cm):
-        GaleraTest.__init__(self,cm)
-        self.name = "NodeRestartOnErrorIfMaster"
+    name = "NodeRestartOnErrorIfMaster"
 
     def test(self, target):
         # start cluster, prepare nodes to be killed
@@ -282,8 +263,7 @@ class NodeRestartOnErrorIfMaster(ClusterStart):
         if self.Env["galera_bundle"]:
             target_nodes=["galera-bundle-%d"%x for x in range(len(self.Env["nodes"]))]
         patterns = [r"galera\(%s\).*INFO:\s+Galera started"]
-        patterns += [self.ratemplates.build("Pat:RscRemoteOp", "stop", "galera", t, 'ok')
-                     for t in target_nodes]
+        patterns += self.ratemplates.build("Pat:RscRemoteOps", "stop", "galera", target_nodes, 'ok')
         watch = self.create_watch(patterns, self.Env["DeadTime"])
         watch.setwatch()
         self.rsh_check(target, "mysqladmin shutdown")
@@ -292,8 +272,7 @@ class NodeRestartOnErrorIfMaster(ClusterStart):
 
         # galera should get respawn during a monitor operation and
         # resource should go to master
-        patterns = [self.ratemplates.build("Pat:RscRemoteOp", "promote", "galera", t, 'ok')
-                     for t in target_nodes]
+        patterns = self.ratemplates.build("Pat:RscRemoteOps", "promote", "galera", target_nodes, 'ok')
         watch = self.create_watch(patterns, self.Env["DeadTime"])
         watch.setwatch()
         watch.look()
@@ -318,14 +297,8 @@ class NodeRecoverWhileClusterIsRunning(ClusterStart):
 
     Note: recovery happens in demote, as it tries to recover last-commit
     '''
-    def __init__(self, cm):
-        GaleraTest.__init__(self,cm)
-        self.name = "NodeRecoverWhileClusterIsRunning"
-
-    def is_applicable(self):
-        # mariadb 10.1+ seems to be immune to pending XA
-        return self.rsh(self.Env["nodes"][0],
-                        "mysql --version | awk '{print $5}' | awk -F. '$1==5 && $2==5 {print 1}' | grep 1") == 0
+    name = "NodeRecoverWhileClusterIsRunning"
+    applicability = [MYSQL_5_5]
 
     def test(self, target):
         # start cluster, prepare nodes to be killed
@@ -362,13 +335,8 @@ class NodeDontChooseForBootstrappingCluster(ClusterStart):
     '''Ensure that a node which is missing grastate.dat will
     not be choosing if other node can bootstrap the cluster.
     '''
-    def __init__(self, cm):
-        GaleraTest.__init__(self,cm)
-        self.name = "NodeDontChooseForBootstrappingCluster"
-
-    def is_applicable(self):
-        return self.rsh(self.Env["nodes"][0],
-                        "grep no-grastate /usr/lib/ocf/resource.d/heartbeat/galera") == 0
+    name = "NodeDontChooseForBootstrappingCluster"
+    applicability = [FileContains(GALERA_RA, "no-grastate")]
 
     def test(self, target):
         # The bootstrap node selection is an ordered process,
@@ -398,14 +366,8 @@ tests.append(NodeDontChooseForBootstrappingCluster)
 
 class NodeRecoverWhileStartingCluster(ClusterStart):
     '''Ensure that a node killed during a transaction does not block cluster bootstrap'''
-    def __init__(self, cm):
-        GaleraTest.__init__(self,cm)
-        self.name = "NodeRecoverWhileStartingCluster"
-
-    def is_applicable(self):
-        # mariadb 10.1+ seems to be immune to pending XA
-        return self.rsh(self.Env["nodes"][0],
-                        "mysql --version | awk '{print $5}' | awk -F. '$1==5 && $2==5 {print 1}' | grep 1") == 0
+    name = "NodeRecoverWhileStartingCluster"
+    applicability = [MYSQL_5_5]
 
     def test(self, target):
         # start cluster, prepare nodes to be killed
@@ -439,8 +401,8 @@ class NodeRecoverWhileStartingCluster(ClusterStart):
         # clean up errors in cib before re-enabling pacemaker,
         # this will also prevent pacemaker to try to restart the
         # killed node before stop. (TODO: am i correct here?)
-        patterns = [self.ratemplates.build("Pat:RscRemoteOp", "stop", "galera", n, 'ok') \
-                    for n in self.Env["nodes"] if n != target]
+        patterns = self.ratemplates.build("Pat:RscRemoteOps", "stop", "galera",
+                                          [n for n in self.Env["nodes"] if n != target], 'ok')
         watch = self.create_watch(patterns, self.Env["DeadTime"])
         watch.setwatch()
         self.rsh_check(target, "pcs resource cleanup galera")
@@ -470,14 +432,8 @@ class NodeSyncFailureEnsureSSTAtNextRestart(ClusterStart):
     '''Ensure that if a node failed to join the cluster while being in
        sync-needed state, the next restart will catch it and request a SST.
     '''
-
-    def __init__(self, cm):
-        GaleraTest.__init__(self,cm)
-        self.name = "NodeSyncFailureEnsureSSTAtNextRestart"
-
-    def is_applicable(self):
-        return self.rsh(self.Env["nodes"][0],
-                        "grep sync-needed /usr/lib/ocf/resource.d/heartbeat/galera") == 0
+    name = "NodeSyncFailureEnsureSSTAtNextRestart"
+    applicability = [FileContains(GALERA_RA, "sync-needed")]
 
     def setup_test(self, target):
         # tmp hack: make first node the target, it can be
@@ -26,22 +26,9 @@ Licensed under the GNU GPL.
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
 
 
-import sys, signal, time, os, re, string, subprocess, tempfile
-from stat import *
-from cts import CTS
-from cts.CTS import CtsLab
-from cts.CTStests import CTSTest
-# from cts.CM_ais import crm_mcp
-from cts.CTSscenarios import *
-from cts.CTSaudits import *
-from cts.CTSvars   import *
-from cts.patterns  import PatternSelector
-from cts.logging   import LogFactory
-from cts.remote    import RemoteFactory
-from cts.watcher   import LogWatcher
-from cts.environment import EnvFactory
-
-from racts.ratest import ResourceAgentTest
+import re
+
+from racts.rafacts import FileContains
 
 from .galeratests import GaleraTest, ClusterStart
 
@@ -50,17 +37,13 @@ tests = []
 class SSTTest(ClusterStart):
     '''Base class for test that require SST and slow network transfer
     '''
-
-    def is_applicable(self):
-        return self.rsh(self.Env["nodes"][0],
-                        "grep sync-needed /usr/lib/ocf/resource.d/heartbeat/galera") == 0
+    applicability = [FileContains("/usr/lib/ocf/resource.d/heartbeat/galera", "sync-needed")]
 
     def start_galera_no_wait(self, target):
         # clean errors and force probe current state
         # this is my way of ensure pacemaker will "promote" nodes
         # rather than just "monitoring" and finding "Master" state
-        patterns = [self.ratemplates.build("Pat:RscRemoteOp", "probe", "galera", n, 'not running') \
-                    for n in self.Env["nodes"]]
+        patterns = self.ratemplates.build("Pat:RscRemoteOps", "probe", "galera", self.Env["nodes"], 'not running')
         watch = self.create_watch(patterns, self.Env["DeadTime"])
         watch.setwatch()
         self.rsh_check(target, "pcs resource cleanup galera")
@@ -188,10 +171,10 @@ class SSTFailureNoScriptOnJoinerNode(SSTTest):
     Donor should start his side of the SST.
     Joiner should be blocked from restarting after the failed sync
     '''
+    name = "SSTFailureNoScriptOnJoinerNode"
 
     def __init__(self, cm):
         GaleraTest.__init__(self,cm)
-        self.name = "SSTFailureNoScriptOnJoinerNode"
         self.bundle_map_sst_script = True
 
     def is_applicable(self):
@@ -274,11 +257,11 @@ class SSTFailureNoScriptOnDonorNode(SSTFailureNoScriptOnJoinerNode):
     This should not be fatal for donor, it should recover and rejoin cluster.
     Joiner should be blocked from restarting after the failed sync
     '''
+    name = "SSTFailureNoScriptOnDonorNode"
 
     def __init__(self, cm):
         GaleraTest.__init__(self,cm)
         self.bundle_map_sst_script = True
-        self.name = "SSTFailureNoScriptOnDonorNode"
 
     def is_applicable(self):
         return True
@@ -306,10 +289,7 @@ class SSTFailureRSyncKilledOnDonorNode(SSTFailureTest):
     This should not be fatal for donor, it should recover and rejoin cluster.
     Joiner should be blocked from restarting after the failed sync
     '''
-
-    def __init__(self, cm):
-        GaleraTest.__init__(self,cm)
-        self.name = "SSTFailureRSyncKilledOnDonorNode"
+    name = "SSTFailureRSyncKilledOnDonorNode"
 
     def is_applicable(self):
         return True
@@ -326,10 +306,7 @@ class SSTFailureRSyncdKilledOnJoinerNode(SSTTest):
     Joiner should be blocked from restarting after the failed sync
     This should not be fatal for donor, it should recover and rejoin cluster.
     '''
-
-    def __init__(self, cm):
-        GaleraTest.__init__(self,cm)
-        self.name = "SSTFailureRSyncdKilledOnJoinerNode"
+    name = "SSTFailureRSyncdKilledOnJoinerNode"
 
     def is_applicable(self):
         return True
@@ -350,10 +327,7 @@ class SSTFailureSSTScriptKilledOnJoinerNode(SSTTest):
     Joiner should be blocked from restarting after the failed sync
     This should not be fatal for donor, it should recover and rejoin cluster.
     '''
-
-    def __init__(self, cm):
-        GaleraTest.__init__(self,cm)
-        self.name = "SSTFailureSSTScriptKilledOnJoinerNode"
+    name = "SSTFailureSSTScriptKilledOnJoinerNode"
 
     def is_applicable(self):
         return True
@@ -375,10 +349,7 @@ class SSTFailureMysqldKilledOnJoinerNode(SSTTest):
     This should not be fatal for donor, it should recover and rejoin cluster.
     Joiner should be blocked from restarting after the failed sync
     '''
-
-    def __init__(self, cm):
-        GaleraTest.__init__(self,cm)
-        self.name = "SSTFailureMysqldKilledOnJoinerNode"
+    name = "SSTFailureMysqldKilledOnJoinerNode"
 
     def is_applicable(self):
         return True
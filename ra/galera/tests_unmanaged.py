@@ -27,23 +27,6 @@ Licensed under the GNU GPL.
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
 
 
-import sys, signal, time, os, re, string, subprocess, tempfile
-from stat import *
-from cts import CTS
-from cts.CTS import CtsLab
-from cts.CTStests import CTSTest
-# from cts.CM_ais import crm_mcp
-from cts.CTSscenarios import *
-from cts.CTSaudits import *
-from cts.CTSvars   import *
-from cts.patterns  import PatternSelector
-from cts.logging   import LogFactory
-from cts.remote    import RemoteFactory
-from cts.watcher   import LogWatcher
-from cts.environment import EnvFactory
-
-from racts.ratest import ResourceAgentTest
-
 from .galeratests import GaleraTest, ClusterStart
 from .galeratests_sst import SSTTest
 
@@ -56,10 +39,7 @@ class UnmanagedNoMonitorWhenStopped(ClusterStart):
     pacemaker shouldn't trigger recurring monitor op at all.
     So status shouldn't change even if a mysqld is started manually
     '''
-
-    def __init__(self, cm):
-        GaleraTest.__init__(self,cm)
-        self.name = "UnmanagedNoMonitorWhenStopped"
+    name = "UnmanagedNoMonitorWhenStopped"
 
     def is_applicable(self):
         return True
@@ -117,10 +97,7 @@ class UnmanagedDoNotPromoteSlave(SSTTest):
     Ensure the resource agent doesn't try to trigger promotion
     during unmanaged state.
     '''
-
-    def __init__(self, cm):
-        GaleraTest.__init__(self,cm)
-        self.name = "UnmanagedDoNotPromoteSlave"
+    name = "UnmanagedDoNotPromoteSlave"
 
     def is_applicable(self):
         return True
@@ -213,10 +190,7 @@ class UnmanagedRecoverAfterErrorWhenMaster(ClusterStart):
     flag should be removed and pacemaker should proceed with passive
     monitoring of the unmanged Master.
     '''
-
-    def __init__(self, cm):
-        GaleraTest.__init__(self,cm)
-        self.name = "UnmanagedRecoverAfterErrorWhenMaster"
+    name = "UnmanagedRecoverAfterErrorWhenMaster"
 
     def is_applicable(self):
         return True
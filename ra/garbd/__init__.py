@@ -1,9 +1,11 @@
-from .scenarios import scenarios
-from . import tests as t
-# from .fencing import fencing
-
-# __all__ = ["scenarios", "tests", "fencing", "name" ]
-__all__ = ["scenarios", "tests", "name" ]
-tests = t.tests
+# the scenarios and tests are only imported when the module
+# is chosen, see racts.racatalog.RAModule
+__all__ = ["name", "manifest"]
 
 name = "Garbd"
+manifest = {
+    "scenarios": ["SimpleSetup"],
+    "tests": ["ClusterStart"],
+    # other RA modules whose scenarios or tests are reused
+    "requires": ["galera"],
+}
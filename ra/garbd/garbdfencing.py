@@ -24,20 +24,12 @@ Licensed under the GNU GPL.
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
 
 
-import sys, signal, time, os, re, string, subprocess, tempfile
-from stat import *
-from cts import CTS
-from cts.CTS import CtsLab
-from cts.CTStests import CTSTest
-from cts.CM_ais import crm_mcp
-from cts.CTSscenarios import *
-from cts.CTSaudits import *
-from cts.CTSvars   import *
-
 from racts.rafencing import RATesterFencingComponent
 
 class Garbd2NodesDelayedFencing(RATesterFencingComponent):
     def setup_scenario(self, cluster_manager):
+        if self.resumed():
+            return
         cluster_manager.log("Enabling fencing in cluster")
         delay=0
         for node in self.Env["nodes"]:
@@ -24,21 +24,6 @@ Licensed under the GNU GPL.
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
 
 
-import sys, signal, time, os, re, string, subprocess, tempfile
-from stat import *
-from cts import CTS
-from cts.CTS import CtsLab
-from cts.CTStests import CTSTest
-from cts.CTSscenarios import *
-from cts.CTSaudits import *
-from cts.CTSvars   import *
-from cts.patterns  import PatternSelector
-from cts.logging   import LogFactory
-from cts.remote    import RemoteFactory
-from cts.watcher   import LogWatcher
-from cts.environment import EnvFactory
-
-from racts.ratest import ResourceAgentTest
 from ra.galera.tests import GaleraCommonTest
 
 tests = []
@@ -85,16 +70,18 @@ class GarbdCommonTest(GaleraCommonTest):
 
     def setup_test(self, node):
         cluster_nodes = self.Env["clusters"][0]
-        self.setup_inactive_resource(cluster_nodes, self.Env["config"])
-        self.setup_inactive_resource(cluster_nodes, self.Env["config-garbd"])
-        self.rsh_check(cluster_nodes[0], "pcs constraint location %s rule"\
-                       " resource-discovery=exclusive score=0 osprole eq galera"%\
-                       self.Env["config"]["name"])
-        self.rsh_check(cluster_nodes[0], "pcs constraint location %s rule"\
-                       " resource-discovery=exclusive score=0 osprole eq garbd"%\
-                       self.Env["config-garbd"]["name"])
-        self.rsh_check(cluster_nodes[0], "pcs constraint order start %s then start %s"%\
-                       (self.Env["config"]["name"],self.Env["config-garbd"]["name"]))
+        # both resources are created in a single CIB update. Constraints
+        # come in a second one, so that resources get probed everywhere
+        self.setup_inactive_resources(cluster_nodes,
+                                      [self.Env["config"], self.Env["config-garbd"]],
+                                      ["pcs constraint location %s rule"\
+                                       " resource-discovery=exclusive score=0 osprole eq galera"%\
+                                       self.Env["config"]["name"],
+                                       "pcs constraint location %s rule"\
+                                       " resource-discovery=exclusive score=0 osprole eq garbd"%\
+                                       self.Env["config-garbd"]["name"],
+                                       "pcs constraint order start %s then start %s"%\
+                                       (self.Env["config"]["name"],self.Env["config-garbd"]["name"])])
             
     def teardown_test(self, node):
         cluster_nodes = self.Env["clusters"][0]
@@ -103,9 +90,7 @@ class GarbdCommonTest(GaleraCommonTest):
 
 class ClusterStart(GarbdCommonTest):
     '''Start the galera cluster on all the nodes'''
-    def __init__(self, cm):
-        GarbdCommonTest.__init__(self,cm)
-        self.name = "ClusterStart"
+    name = "ClusterStart"
 
     def test(self, target):
         '''Start an entire Galera cluster'''
@@ -140,8 +125,7 @@ class ClusterStart(GarbdCommonTest):
         # bundles run OCF resources on bundle nodes, not host nodes
         galera_ocf_name = self.Env["config"]["ocf_name"]
         galera_target_nodes = self.resource_target_nodes(galera_rsc, cluster_nodes)
-        patterns = [self.ratemplates.build("Pat:RscRemoteOp", "promote", galera_ocf_name, n, 'ok') \
-                    for n in galera_target_nodes]
+        patterns = self.ratemplates.build("Pat:RscRemoteOps", "promote", galera_ocf_name, galera_target_nodes, 'ok')
         garbd_target_node = self.resource_target_nodes(garbd_rsc, self.Env["arb"])
         patterns += [self.ratemplates.build("Pat:RscRemoteOp", "start", garbd_name, garbd_target_node, 'ok')]
         watch = self.make_watch(patterns)
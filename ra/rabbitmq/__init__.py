@@ -1,6 +1,11 @@
-from .scenarios import scenarios
-from . import tests as t
+# the scenarios and tests are only imported when the module
+# is chosen, see racts.racatalog.RAModule
+__all__ = ["name", "manifest"]
 
-__all__ = [ "tests", "scenarios", "name" ]
-tests = t.tests
 name = "RabbitMQ"
+manifest = {
+    "scenarios": ["SimpleSetup", "BundleSetup"],
+    "tests": ["ClusterStart", "ClusterRebootAllNodes"],
+    # other RA modules whose scenarios or tests are reused
+    "requires": [],
+}
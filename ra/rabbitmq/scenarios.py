@@ -26,19 +26,7 @@ Licensed under the GNU GPL.
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
 
 
-import sys, signal, time, os, re, string, subprocess, tempfile
-from stat import *
-from cts import CTS
-from cts.CTS import CtsLab
-from cts.CTStests import CTSTest
-from cts.CTSscenarios import *
-from cts.CTSaudits import *
-from cts.CTSvars   import *
-from cts.patterns  import PatternSelector
-from cts.logging   import LogFactory
-from cts.remote    import RemoteFactory
-from cts.watcher   import LogWatcher
-from cts.environment import EnvFactory
+import os
 
 from racts.rascenario import RATesterScenarioComponent
 from racts.raconfig import RAConfig
@@ -60,7 +48,7 @@ class PrepareCluster(RATesterScenarioComponent):
         rmqadmin=os.path.join(configdir, "rabbitmqadmin.conf")
         erlcookie=os.path.join(configdir, "cookie")
 
-        for node in cluster_nodes:
+        def setup_node_config(node):
             ip=self.node_ip(node)
             ipcomma=ip.replace(".",",")
             shortname=self.node_shortname(node)
@@ -85,10 +73,12 @@ class PrepareCluster(RATesterScenarioComponent):
                                   "%IPV6RABBITMQSERVER%": ipv6rabbitmqserver,
                                   "%IPV6RABBITMQCTL%": ipv6rabbitmqctl
                               })
+        self.run_on_nodes(setup_node_config, cluster_nodes)
 
     def setup_state(self, cluster_nodes):
         config=self.Env["config"]
-        for node in cluster_nodes:
+
+        def setup_node_state(node):
             # blank rabbitmq state on disk
             self.log("recreating rabbitmq mnesia on node %s"%node)
             self.rsh(node, "rm -rf /var/lib/rabbitmq /var/log/rabbitmq")
@@ -102,6 +92,7 @@ class PrepareCluster(RATesterScenarioComponent):
             # chown log file
             self.rsh(node, "chown -R %s:%s /var/log/rabbitmq /var/lib/rabbitmq"%\
                      (config["user"], config["user"]))
+        self.run_on_nodes(setup_node_state, cluster_nodes)
 
 
 
@@ -26,20 +26,6 @@ Licensed under the GNU GPL.
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
 
 
-import sys, signal, time, os, re, string, subprocess, tempfile
-from stat import *
-from cts import CTS
-from cts.CTS import CtsLab
-from cts.CTStests import CTSTest
-from cts.CTSscenarios import *
-from cts.CTSaudits import *
-from cts.CTSvars   import *
-from cts.patterns  import PatternSelector
-from cts.logging   import LogFactory
-from cts.remote    import RemoteFactory
-from cts.watcher   import LogWatcher
-from cts.environment import EnvFactory
-
 from racts.ratest import ResourceAgentTest
 
 tests = []
@@ -81,9 +67,7 @@ class RabbitMQCommonTest(ResourceAgentTest):
 
 class ClusterStart(RabbitMQCommonTest):
     '''Start a rabbitmq cluster'''
-    def __init__(self, cm):
-        RabbitMQCommonTest.__init__(self,cm)
-        self.name = "ClusterStart"
+    name = "ClusterStart"
 
     def test(self, target):
         # setup_test has created the inactive resource
@@ -103,8 +87,7 @@ class ClusterStart(RabbitMQCommonTest):
 
         # bundles run OCF resources on bundle nodes, not host nodes
         target_nodes = self.resource_target_nodes(config, self.Env["nodes"])
-        patterns = [self.ratemplates.build("Pat:RscRemoteOp", "start", ocf_name, n, 'ok') \
-                    for n in target_nodes]
+        patterns = self.ratemplates.build("Pat:RscRemoteOps", "start", ocf_name, target_nodes, 'ok')
         watch = self.make_watch(patterns)
         self.rsh_check(target, "pcs resource enable %s"%name)
         watch.lookforall()
@@ -117,9 +100,7 @@ tests.append(ClusterStart)
 
 class ClusterRebootAllNodes(ClusterStart):
     '''Restart the rabbitmq cluster after all hosts have been rebooted'''
-    def __init__(self, cm):
-        RabbitMQCommonTest.__init__(self,cm)
-        self.name = "ClusterRebootAllNodes"
+    name = "ClusterRebootAllNodes"
 
     def test(self, target):
         # ClusterStart starts all the rabbitmq clones
@@ -129,15 +110,14 @@ class ClusterRebootAllNodes(ClusterStart):
         config = self.config
         name = config["name"]
         target_nodes = self.resource_target_nodes(config, self.Env["nodes"])
-        patterns = [self.ratemplates.build("Pat:RscRemoteOp", "start", name, n, 'ok') \
-                    for n in target_nodes]
+        patterns = self.ratemplates.build("Pat:RscRemoteOps", "start", name, target_nodes, 'ok')
         watch = self.make_watch(patterns)
+        boot_ids = self.boot_ids(self.Env["nodes"])
         self.log("Force-reset nodes "%self.Env["nodes"])
         for n in self.Env["nodes"]:
             self.rsh(n, "echo b > /proc/sysrq-trigger")
         self.log("Wait until all nodes are restarted and reachable over ssh")
-        for n in self.Env["nodes"]:
-            self.wait_until_restarted(n)
+        self.wait_until_reachable(self.Env["nodes"], boot_ids=boot_ids)
         # wait until pacemaker restart all the rabbitmq clones
         watch.lookforall()
         assert not watch.unmatched, watch.unmatched
@@ -41,14 +41,13 @@ class PrepareCluster(RATesterScenarioComponent):
 
     def setup_configs(self, cluster_nodes):
         config = self.Env["config"]
-        node = cluster_nodes[0]
 
         self.log("Setting up redis config files")
         basedir = os.path.dirname(os.path.abspath(__file__))
         configdir = os.path.join(basedir, "config")
         rediscfg = os.path.join(configdir, "redis.conf.in")
 
-        for node in cluster_nodes:
+        def setup_node_config(node):
             if bool(config["ipv6"]):
                 ip = "["+self.node_ipv6(node)+"]"
                 shortname = self.node_fqdn_ipv6(node)
@@ -64,10 +63,12 @@ class PrepareCluster(RATesterScenarioComponent):
                                   "%HOSTIP%": ip,
                                   "%HOSTNAME%": shortname
                               })
+        self.run_on_nodes(setup_node_config, cluster_nodes)
 
     def setup_state(self, cluster_nodes):
         config = self.Env["config"]
-        for node in cluster_nodes:
+
+        def setup_node_state(node):
             # blank galera state on disk
             if not bool(config["skip_install_db"]):
                 self.log("recreating empty redis database on node %s" % node)
@@ -79,6 +80,7 @@ class PrepareCluster(RATesterScenarioComponent):
                 self.rsh(node, "which chcon && chcon -R -t container_file_t /etc/redis /var/lib/redis /var/log/redis /var/run/redis")
             else:
                 self.rsh(node, "which restorecon && restorecon -R /etc/redis /var/lib/redis /var/log/redis /var/run/redis")
+        self.run_on_nodes(setup_node_state, cluster_nodes)
 
 
 # The scenario below set up two basic configuration for the RA tests
@@ -67,9 +67,7 @@ class RedisCommonTest(ResourceAgentTest):
 
 class ClusterStart(RedisCommonTest):
     '''Start a redis cluster'''
-    def __init__(self, cm):
-        RedisCommonTest.__init__(self, cm)
-        self.name = "ClusterStart"
+    name = "ClusterStart"
 
     def test(self, target):
         # setup_test has created the inactive resource
@@ -89,8 +87,7 @@ class ClusterStart(RedisCommonTest):
         # bundles run OCF resources on bundle nodes, not host nodes
         name = rsc["ocf_name"]
         target_nodes = self.resource_target_nodes(rsc, self.Env["nodes"])
-        patterns = [self.ratemplates.build("Pat:RscRemoteOp", "promote", name, n, 'ok')
-                    for n in target_nodes]
+        patterns = self.ratemplates.build("Pat:RscRemoteOps", "promote", name, target_nodes, 'ok')
         watch = self.make_watch(patterns)
         self.rsh_check(target, "pcs resource enable %s" % rsc["name"])
         watch.look()
@@ -121,9 +118,7 @@ tests.append(ClusterStart)
 
 class ClusterStop(ClusterStart):
     '''Stop a redis cluster'''
-    def __init__(self, cm):
-        ClusterStart.__init__(self, cm)
-        self.name = "ClusterStop"
+    name = "ClusterStop"
 
     def test(self, target):
         # start cluster
@@ -134,8 +129,7 @@ class ClusterStop(ClusterStart):
         ocf_name = config["ocf_name"]
 
         target_nodes = self.resource_target_nodes(config, self.Env["nodes"])
-        patterns = [self.ratemplates.build("Pat:RscRemoteOp", "stop", ocf_name, n, 'ok')
-                    for n in target_nodes]
+        patterns = self.ratemplates.build("Pat:RscRemoteOps", "stop", ocf_name, target_nodes, 'ok')
         watch = self.make_watch(patterns)
         self.rsh_check(target, "pcs resource disable %s" % name)
         watch.lookforall()
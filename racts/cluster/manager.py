@@ -1,10 +1,123 @@
+import time
+import xml.etree.ElementTree as ET
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+
+# pacemaker 2.1 renamed the roles of promotable resources
+ROLES = {"Master": "Promoted", "Slave": "Unpromoted"}
+
+
+class CIBTransaction(object):
+    '''pcs commands applied to an offline copy of the CIB, which
+    is pushed back to the cluster in a single update'''
+    def __init__(self, cluster_manager, node):
+        self.cluster_manager = cluster_manager
+        self.node = node
+        self.commands = []
+
+    def add(self, command):
+        assert command.startswith("pcs "), "not a pcs command: %s" % command
+        self.commands.append("pcs -f $cib " + command[4:])
+
+    def commit(self):
+        if not self.commands:
+            return
+        self.cluster_manager.rsh_check(
+            self.node,
+            "cib=$(mktemp /tmp/ratester-cib.XXXXXX) && pcs cluster cib $cib && " +
+            " && ".join(self.commands) +
+            " && pcs cluster cib-push $cib --config; rc=$?; rm -f $cib; exit $rc")
 
 
 class ClusterManager(ABC):
     def __init__(self, env):
         self.Env = env
 
+    @contextmanager
+    def cib_transaction(self, node):
+        '''Batch the pcs commands added to the transaction into a
+        single CIB update, pushed when the block exits successfully'''
+        transaction = CIBTransaction(self, node)
+        yield transaction
+        transaction.commit()
+
+    def cib_query(self, node, scope):
+        '''XML of a section of the live CIB'''
+        rc, lines = self.rsh(node, "cibadmin -Q --scope %s" % scope, stdout=None)
+        assert rc == 0, "could not query CIB %s on %s" % (scope, node)
+        return "".join(lines)
+
+    def cib_replace_configuration(self, node, xml):
+        rc, out, err = self.rsh.call_with_input(
+            node, "cibadmin --replace --scope configuration --xml-pipe", xml.encode())
+        assert rc == 0, "could not replace CIB configuration: %s" % "".join(err).strip()
+
+    def cluster_status(self, node):
+        '''crm_mon XML status of the cluster, None if unavailable'''
+        rc, lines = self.rsh(node, self.status_xml_command, stdout=None, silent=True)
+        if rc != 0:
+            return None
+        try:
+            return ET.fromstring("".join(lines))
+        except ET.ParseError:
+            return None
+
+    def is_settling(self, node, online=[]):
+        '''True once the cluster has a DC and all nodes in online are up'''
+        status = self.cluster_status(node)
+        if status is None:
+            return False
+        dc = status.find(".//current_dc")
+        up = [n.get("name") for n in status.iter("node") if n.get("online") == "true"]
+        return dc is not None and dc.get("present") == "true" and \
+            all([n in up for n in online])
+
+    def wait_for_idle(self, node, timeout, online=[]):
+        '''Wait until the cluster has no pending action.
+        This doesn't depend on log delivery, it returns as soon
+        as the last transition is complete'''
+        deadline = time.time() + timeout
+        late = self.wait_until(lambda n: self.is_settling(n, online), [node], timeout)
+        assert not late, "cluster did not elect a DC after %ds" % timeout
+        remaining = max(1, int(deadline - time.time()))
+        rc = self.rsh(node, "crm_resource --wait --timeout=%ds" % remaining)
+        assert rc == 0, "cluster did not settle after %ds" % timeout
+
+    def resource_nodes(self, node, resource, role="Started"):
+        '''Nodes where the resource (or its clone or bundle instances)
+        is active with role'''
+        status = self.cluster_status(node)
+        if status is None:
+            return None
+        role = ROLES.get(role, role)
+        nodes = set()
+        for rsc in status.iter("resource"):
+            if rsc.get("id").split(":")[0] != resource or \
+               ROLES.get(rsc.get("role"), rsc.get("role")) != role:
+                continue
+            nodes.update([n.get("name") for n in rsc.iter("node")])
+        return nodes
+
+    def wait_for_resource_state(self, node, resource, role, nodes, timeout):
+        '''Wait until the resource has role on all the nodes'''
+        deadline = time.time() + timeout
+        self.wait_for_idle(node, timeout)
+
+        def reached(n):
+            current = self.resource_nodes(n, resource, role)
+            return current is not None and set(nodes).issubset(current)
+        remaining = max(1, int(deadline - time.time()))
+        late = self.wait_until(reached, [node], remaining)
+        assert not late, "%s not %s on %s after %ds (currently on %s)" % \
+            (resource, role, ",".join(nodes), timeout,
+             ",".join(sorted(self.resource_nodes(node, resource, role) or [])))
+
+    @property
+    @abstractmethod
+    def status_xml_command(self):
+        pass
+
     @abstractmethod
     def is_detected(self):
         pass
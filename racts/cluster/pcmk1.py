@@ -1,6 +1,7 @@
 from cts.logging import LogFactory
 from cts.remote import RemoteFactory
 from racts.raaction import ActionMixin
+from racts.rafacts import node_facts
 from .manager import ClusterManager
 
 
@@ -12,7 +13,7 @@ class Pacemaker1(ClusterManager, ActionMixin):
         self.rsh = RemoteFactory().getInstance()
 
     def is_detected(self):
-        return self.rsh(self.Env["nodes"][0], "pacemakerd --version | grep -q 'Pacemaker 1.'") == 0
+        return node_facts.get(self.Env["nodes"][0], "pacemaker_version").startswith("1.")
 
     def authenticate_nodes(self, nodes):
         self.rsh_check(nodes[0], "pcs cluster auth -u hacluster -p ratester %s" %
@@ -50,6 +51,10 @@ class Pacemaker1(ClusterManager, ActionMixin):
             r"pengine.*:\s*error: NOTE: Clusters with shared data need STONITH to ensure data integrity"
         ]
 
+    @property
+    def status_xml_command(self):
+        return "crm_mon -1 --as-xml"
+
     @property
     def attribute_absent_errno(self):
         return 6
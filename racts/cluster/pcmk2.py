@@ -1,6 +1,7 @@
 from cts.logging import LogFactory
 from cts.remote import RemoteFactory
 from racts.raaction import ActionMixin
+from racts.rafacts import node_facts
 from .manager import ClusterManager
 
 
@@ -12,7 +13,7 @@ class Pacemaker2(ClusterManager, ActionMixin):
         self.rsh = RemoteFactory().getInstance()
 
     def is_detected(self):
-        return self.rsh(self.Env["nodes"][0], "pacemakerd --version | grep -q 'Pacemaker 2.'") == 0
+        return node_facts.get(self.Env["nodes"][0], "pacemaker_version").startswith("2.")
 
     def authenticate_nodes(self, nodes):
         for n in nodes:
@@ -51,6 +52,10 @@ class Pacemaker2(ClusterManager, ActionMixin):
             r"pacemaker-schedulerd.*:\s*error: NOTE: Clusters with shared data need STONITH to ensure data integrity"
         ]
 
+    @property
+    def status_xml_command(self):
+        return "crm_mon -1 --output-as=xml"
+
     @property
     def attribute_absent_errno(self):
         return 105
@@ -1,6 +1,7 @@
 from cts.logging import LogFactory
 from cts.remote import RemoteFactory
 from racts.raaction import ActionMixin
+from racts.rafacts import node_facts
 
 from .engine import ContainerEngine
 
@@ -13,18 +14,16 @@ class Docker(ContainerEngine, ActionMixin):
         self.rsh = RemoteFactory().getInstance()
 
     def is_detected(self):
-        return self.rsh(self.Env["nodes"][0], "docker --version") == 0
+        return "docker" in node_facts.get(self.Env["nodes"][0], "container_engines").split()
 
     def package_name(self):
         return "docker"
 
     def enable_engine(self, nodes):
-        for node in nodes:
-            self.rsh_check(node, "systemctl enable docker --now")
+        self.run_on_nodes(lambda node: self.rsh_check(node, "systemctl enable docker --now"), nodes)
 
     def pull_image(self, nodes, img):
-        for node in nodes:
-            self.rsh_check(node, "docker pull %s" % img)
+        self.run_on_nodes(lambda node: self.rsh_check(node, "docker pull %s" % img), nodes)
 
     def errorstoignore(self):
         return [
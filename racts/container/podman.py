@@ -1,6 +1,7 @@
 from cts.logging import LogFactory
 from cts.remote import RemoteFactory
 from racts.raaction import ActionMixin
+from racts.rafacts import node_facts
 
 from .engine import ContainerEngine
 
@@ -13,7 +14,7 @@ class Podman(ContainerEngine, ActionMixin):
         self.rsh = RemoteFactory().getInstance()
 
     def is_detected(self):
-        return self.rsh(self.Env["nodes"][0], "podman --version") == 0
+        return "podman" in node_facts.get(self.Env["nodes"][0], "container_engines").split()
 
     def package_name(self):
         return "podman"
@@ -23,8 +24,7 @@ class Podman(ContainerEngine, ActionMixin):
         pass
 
     def pull_image(self, nodes, img):
-        for node in nodes:
-            self.rsh_check(node, "podman pull %s" % img)
+        self.run_on_nodes(lambda node: self.rsh_check(node, "podman pull %s" % img), nodes)
 
     def errorstoignore(self):
         return []
@@ -26,12 +26,23 @@ Licensed under the GNU GPL.
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
 
 
-from subprocess import Popen, PIPE
+import getpass
+import hashlib
+import os
+import re
+import socket
+import threading
+import time
+from subprocess import Popen, PIPE, DEVNULL
 from cts.remote import RemoteExec, RemoteFactory
 from cts.watcher import LogWatcher
 from cts.environment import Environment
 from cts.CTS import NodeStatus
 
+from racts.raevents import op_latency, parse_op_result
+from racts.ramatcher import pattern_set
+from racts.ratrace import tracer
+
 
 def ratester___get_lines(self, timeout):
     count = 0
@@ -53,6 +64,138 @@ def ratester___get_lines(self, timeout):
             self.file_list = [x for x in self.file_list if x.host != t.node]
 
 
+class ControlMasterTracker(object):
+    '''Track the state of the SSH control master socket of each node.
+
+    A connection check (a full "ssh node true") is only needed when
+    the control master socket of a node is missing. The socket state
+    is checked locally, and a node is re-probed after a remote command
+    failed to connect, after it has been fenced or rebooted, or when
+    its last probe is older than the staleness window.
+    '''
+    def __init__(self, staleness=300):
+        self.staleness = staleness
+        self.lock = threading.Lock()
+        self.paths = {}
+        self.endpoints = {}
+        self.probed = {}
+        self.listeners = []
+
+    def add_listener(self, callback):
+        '''Call callback(node) every time a node is invalidated'''
+        self.listeners.append(callback)
+
+    def control_path(self, rsh, node):
+        '''Local path of the control master socket, None if ssh doesn't
+        use connection sharing for that node, False if unknown'''
+        with self.lock:
+            if node in self.paths:
+                return self.paths[node]
+        proc = Popen("%s -G %s" % (rsh.rsh.Command, node), stdout=PIPE,
+                     stderr=DEVNULL, close_fds=True, shell=True)
+        out = proc.communicate()[0].decode(errors="replace")
+        config = dict([x.split(" ", 1) for x in out.splitlines() if " " in x])
+        if proc.returncode == 0:
+            with self.lock:
+                self.endpoints[node] = (config.get("hostname", node),
+                                        int(config.get("port", "22")))
+        if proc.returncode != 0 or "controlpath" not in config:
+            path = False
+        elif config.get("controlmaster", "false") == "false" or \
+                config["controlpath"] == "none":
+            path = None
+        else:
+            path = self.expand_control_path(config, node)
+        with self.lock:
+            self.paths[node] = path
+        return path
+
+    def endpoint(self, rsh, node):
+        '''(host, port) that ssh connects to for node, None if unknown'''
+        self.control_path(rsh, node)
+        with self.lock:
+            return self.endpoints.get(node)
+
+    def expand_control_path(self, config, node):
+        local = socket.gethostname()
+        tokens = {
+            "%": "%",
+            "h": config.get("hostname", node),
+            "n": node,
+            "p": config.get("port", "22"),
+            "r": config.get("user", ""),
+            "u": getpass.getuser(),
+            "l": local,
+            "L": local.split(".")[0],
+            "i": str(os.getuid()),
+            "d": os.path.expanduser("~"),
+        }
+        tokens["C"] = hashlib.sha1((tokens["l"] + tokens["h"] + tokens["p"] +
+                                    tokens["r"]).encode()).hexdigest()
+        path = config["controlpath"]
+        expanded = ""
+        i = 0
+        while i < len(path):
+            if path[i] == "%" and i + 1 < len(path):
+                expanded += tokens.get(path[i+1], path[i:i+2])
+                i += 2
+            else:
+                expanded += path[i]
+                i += 1
+        return os.path.expanduser(expanded)
+
+    def needs_probe(self, rsh, node):
+        with self.lock:
+            last = self.probed.get(node)
+        if last is None:
+            return True
+        if self.staleness <= 0 or time.time() - last > self.staleness:
+            return True
+        path = self.control_path(rsh, node)
+        # a missing socket means the next ssh call would spawn a
+        # new control master, which must be done by a probe
+        return path is not None and path is not False and not os.path.exists(path)
+
+    def probe_result(self, node, rc):
+        if rc == 0:
+            with self.lock:
+                self.probed[node] = time.time()
+        else:
+            self.invalidate(node)
+
+    def invalidate(self, node):
+        '''Force a new connection check on the next remote call
+        (e.g. the node got fenced or rebooted)'''
+        with self.lock:
+            self.probed.pop(node, None)
+        for callback in self.listeners:
+            callback(node)
+
+
+control_masters = ControlMasterTracker()
+
+
+class ConnectionCheckDelegate(object):
+    '''Invalidate the node's connection state when ssh failed to
+    reach it, and forward the completion to the caller's delegate.
+    The duration of asynchronous commands is traced on completion.'''
+    def __init__(self, node, delegate=None, command=None):
+        self.node = node
+        self.delegate = delegate
+        self.command = command
+        self.begin = time.time()
+        self.tid = threading.get_ident()
+
+    def async_complete(self, pid, returncode, outLines, errLines):
+        if returncode == 255:
+            control_masters.invalidate(self.node)
+        if self.command is not None:
+            tracer.record(self.command.strip()[:60], "async", self.begin, time.time(),
+                          self.node, {"command": self.command, "rc": returncode}, self.tid)
+        if self.delegate:
+            self.delegate.async_complete(pid, returncode, outLines, errLines)
+
+
 def ratester_ensure_control_master(self, node):
     # SSH control master: at start of after a node is fenced, the
     # master socket might not be present. If so, we cannot 'readlines'
@@ -60,11 +203,14 @@ def ratester_ensure_control_master(self, node):
     # pid leaking a dup'd fd.
     # Force the creation of the master socket here, without reading
     # output to avoid dead locking on the next remote call
+    if not control_masters.needs_probe(self, node):
+        return (None, 0)
     proc = Popen(self._cmd([node, "true"]),
                  stdout=PIPE, stderr=PIPE, close_fds=True, shell=True)
     rc = proc.wait()
     proc.stdout.close()
     proc.stderr.close()
+    control_masters.probe_result(node, rc)
     return (proc, rc)
 
 
@@ -76,7 +222,8 @@ def ratester_call_async(self, node, command, completionDelegate=None):
             completionDelegate.async_complete(proc.pid, rc, [], [])
         return 0
     else:
-        return self.orig_call_async(node, command, completionDelegate)
+        return self.orig_call_async(node, command,
+                                    ConnectionCheckDelegate(node, completionDelegate, command))
 
 
 def ratester___call__(self, node, command, stdout=0, synchronous=1, silent=False, blocking=True, completionDelegate=None):
@@ -88,9 +235,41 @@ def ratester___call__(self, node, command, stdout=0, synchronous=1, silent=False
                 completionDelegate.async_complete(proc.pid, rc, [], [])
             return 0
         return (rc, "" if stdout == 1 else [])
-    else:
+    elif not synchronous:
         return self.orig___call__(node, command, stdout, synchronous,
-                                  silent, blocking, completionDelegate)
+                                  silent, blocking,
+                                  ConnectionCheckDelegate(node, completionDelegate, command))
+    else:
+        with tracer.remote(node, command):
+            return self.orig___call__(node, command, stdout, synchronous,
+                                      silent, blocking,
+                                      ConnectionCheckDelegate(node, completionDelegate))
+
+
+def ratester_call_with_input(self, node, command, data):
+    '''Run a command on a node and feed data (bytes) to its stdin.
+    Return (rc, stdout lines, stderr lines)'''
+    proc, rc = self.ensure_control_master(node)
+    if rc != 0:
+        self.debug("Connection check to %s failed. Node went inaccessible." % node)
+        return (rc, [], [])
+    # the default ssh command line disables stdin
+    remote = command
+    command = self._cmd([node, command]).replace(
+        self.rsh.Command, " ".join([x for x in self.rsh.Command.split() if x != "-n"]), 1)
+    with tracer.remote(node, remote):
+        proc = Popen(command, stdin=PIPE, stdout=PIPE, stderr=PIPE, close_fds=True, shell=True)
+        out, err = proc.communicate(data)
+    if proc.returncode == 255:
+        control_masters.invalidate(node)
+    return (proc.returncode,
+            out.decode(errors="replace").splitlines(True),
+            err.decode(errors="replace").splitlines(True))
+
+
+def ratester_cp(self, source, target, silent=False):
+    with tracer.span("cp %s" % os.path.basename(source), "cp", source=source, target=target):
+        return self.orig_cp(source, target, silent)
 
 
 def ratester_environment__setitem__(self, key, value):
@@ -105,12 +284,156 @@ def ratester_environment__setitem__(self, key, value):
 
 def ratester_is_node_booted(self, node):
     '''Return TRUE if the given node is booted (responds to pings)'''
+    # only called when the node state is uncertain (e.g. fencing)
+    control_masters.invalidate(node)
     return RemoteFactory().getInstance()(node, "/bin/true", silent=True) == 0
 
 
+def ratester_look(self, timeout=None, silent=False):
+    '''Examine the log looking for the given patterns.
+    Return the first line which matches any of our patterns.
+    '''
+    if timeout is None:
+        timeout = self.Timeout
+    debug_level = self.debug_level or 0
+    lines = 0
+    begin = time.time()
+    end = begin + timeout + 1
+    if debug_level > 2:
+        self.debug("starting single search: timeout=%d, begin=%d, end=%d" % (timeout, begin, end))
+
+    if not self.regexes:
+        self.debug("Nothing to look for")
+        return None
+    patterns = pattern_set(self.regexes)
+
+    scanned = 0
+    try:
+        if timeout == 0:
+            for f in self.file_list:
+                f.setend()
+
+        while True:
+            if len(self.line_cache):
+                lines += 1
+                with self.cache_lock:
+                    line = self.line_cache.pop(0)
+                scanned += len(line)
+                if "CTS:" in line:
+                    continue
+                if debug_level > 2:
+                    self.debug("Processing: " + line)
+                which, matchobj = patterns.search(line)
+                if matchobj:
+                    self.whichmatch = which
+                    if self.returnonlymatch:
+                        return matchobj.group(self.returnonlymatch)
+                    self.debug("Matched: " + line)
+                    if debug_level > 1:
+                        self.debug("With: " + self.regexes[which])
+                    return line
+
+            elif timeout > 0 and end < time.time():
+                if debug_level > 1:
+                    self.debug("hit timeout: %d" % timeout)
+                timeout = 0
+                for f in self.file_list:
+                    f.setend()
+
+            else:
+                self._LogWatcher__get_lines(timeout)
+                if len(self.line_cache) == 0 and end < time.time():
+                    self.end()
+                    self.debug("Single search terminated: start=%d, end=%d, now=%d, lines=%d" %
+                               (begin, end, time.time(), lines))
+                    return None
+                else:
+                    self.debug("Waiting: start=%d, end=%d, now=%d, lines=%d" %
+                               (begin, end, time.time(), len(self.line_cache)))
+                    time.sleep(1)
+    finally:
+        tracer.add_scanned(scanned)
+
+
+def ratester_setwatch(self):
+    '''Mark the place to start watching the log from'''
+    from racts.rajournal import journal_streams, StreamObj
+    with tracer.span("setwatch %s" % self.name, "watch", patterns=len(self.regexes)):
+        if self.kind == "journal" and journal_streams.enabled:
+            for node in self.hosts:
+                self.file_list.append(StreamObj(node, self.name, self.regexes))
+        else:
+            self.orig_setwatch()
+
+
+def ratester_lookforall(self, timeout=None, allow_multiple_matches=None, silent=False):
+    '''Examine the log looking for ALL of the given patterns.
+    Unless a timeout is given, wait for each pattern as long as it
+    took to match in the previous runs, up to the watch's timeout.
+    A pattern that takes longer than that is waited for up to the
+    watch's timeout before failing, so the learned timeout can grow.
+    The latency of the operation results that matched is kept in
+    op_latencies, as a list of (OpResult, seconds).
+    '''
+    from racts.ratimeouts import watch_timeouts
+    learned = timeout is None
+    if learned:
+        timeout = watch_timeouts.timeout(self.regexes, self.hosts, self.Timeout)
+    with tracer.span("lookforall %s" % self.name, "watch", patterns=len(self.regexes), timeout=timeout):
+        save_regexes = self.regexes
+        self.regexes = list(self.regexes)
+        result = []
+        latencies = []
+        self.op_latencies = []
+        begin = time.time()
+        while len(self.regexes) > 0:
+            line = self.look(timeout)
+            if not line and learned and timeout < self.Timeout:
+                # slower than the previous runs, but not necessarily broken
+                self.debug("%s: no match after the learned timeout of %ds, waiting up to %ds" %
+                           (self.name, timeout, self.Timeout))
+                line = self.look(self.Timeout - timeout)
+                timeout = self.Timeout
+            if not line:
+                self.unmatched = self.regexes
+                self.matched = result
+                self.regexes = save_regexes
+                self.end()
+                return None
+            result.append(line)
+            # operations are timed from when they got logged
+            op = parse_op_result(line)
+            elapsed = op_latency(op, begin, time.time()) if op else time.time() - begin
+            if op:
+                self.op_latencies.append((op, elapsed))
+                self.debug("%s %s on %s: %s after %.1fs" % (op.op, op.resource, op.node, op.status, elapsed))
+                tracer.record("%s %s" % (op.op, op.resource), "op", begin, begin + elapsed, op.node,
+                              {"status": op.status, "rc": op.rc, "call": op.call_id})
+            if not allow_multiple_matches:
+                latencies.append((self.regexes[self.whichmatch], elapsed))
+                del self.regexes[self.whichmatch]
+            else:
+                # allow multiple regexes to match a single line
+                latencies += [(x, elapsed) for x in self.regexes if re.search(x, line)]
+                self.regexes = [x for x in self.regexes if not re.search(x, line)]
+        self.unmatched = None
+        self.matched = result
+        self.regexes = save_regexes
+        watch_timeouts.record(latencies, self.hosts)
+        return result
+
+
 def monkey_patch_cts_log_watcher():
     # continue watching when a node gets unresponsive (fencing)
     LogWatcher._LogWatcher__get_lines = ratester___get_lines
+    # read journal lines from a persistent stream rather than
+    # polling every node
+    LogWatcher.orig_setwatch = LogWatcher.setwatch
+    LogWatcher.setwatch = ratester_setwatch
+    # wait for patterns as long as they took in previous runs
+    LogWatcher.lookforall = ratester_lookforall
+    # match all the patterns at once rather than one at a time
+    LogWatcher.look = ratester_look
 
 
 def monkey_patch_cts_remote_commands():
@@ -121,6 +444,9 @@ def monkey_patch_cts_remote_commands():
     RemoteExec.ensure_control_master = ratester_ensure_control_master
     RemoteExec.__call__ = ratester___call__
     RemoteExec.call_async = ratester_call_async
+    RemoteExec.call_with_input = ratester_call_with_input
+    RemoteExec.orig_cp = RemoteExec.cp
+    RemoteExec.cp = ratester_cp
 
 
 def monkey_patch_cts_env_node_setup():
@@ -1,4 +1,4 @@
-from cts.remote import RemoteFactory
+from racts.rafacts import node_facts
 
 from .rpm_rhel_7 import RpmRHEL7
 from .rpm_rhel_8 import RpmRHEL8
@@ -10,11 +10,8 @@ def get_distribution(env):
 
 
 def autodetect_distribution(env):
-    rsh = RemoteFactory().getInstance()
-    # TODO allow rsh to output multiple lines
-    output = rsh(env["nodes"][0], "lsb_release -a | tr '\n' '|'", stdout=1)
-    values = [s.split(":", 1) for s in output.rstrip("\n|").split("|")]
-    info = dict([[s.strip() for s in v] for v in values])
+    facts = node_facts.gather(env["nodes"][0])
+    info = dict([(k[4:], v.strip()) for k, v in facts.items() if k.startswith("lsb.")])
     manager = False
     if info["Distributor ID"].startswith("RedHatEnterprise"):
         if info["Release"].startswith("7."):
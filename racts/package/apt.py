@@ -28,3 +28,22 @@ class Apt(PackageManager, ActionMixin):
     def _update(self, node, pkg):
         self.rsh_check(node, "apt-get install -y %s" % pkg)
 
+    def _query_state(self, node, pkgs):
+        rc, lines = self.rsh(node,
+                             "for p in %s; do apt-cache policy $p | "
+                             "awk -v p=$p '/Installed:/ {I=$2} /Candidate:/ {C=$2} "
+                             "END {if (I==\"\" || I==\"(none)\") print \"missing\", p; "
+                             "else if (I!=C) print \"outdated\", p; else print \"current\", p}'; done" %
+                             " ".join(pkgs),
+                             stdout=None)
+        assert rc == 0, "could not query state of packages %s" % pkgs
+        return dict([line.split()[::-1] for line in lines if len(line.split()) == 2])
+
+    def fingerprint(self, node):
+        out = self.rsh(node, "sha256sum < /var/lib/dpkg/status", stdout=1)
+        return out.split()[0] if out.strip() else None
+
+    def _ensure(self, node, pkgs):
+        # apt-get install also upgrades the packages already installed
+        self.rsh_check(node, "apt-get install -y %s" % " ".join(pkgs))
+
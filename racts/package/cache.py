@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+import threading
+
+
+class PackageCache(object):
+    '''Local record of the packages already checked on each node.
+
+    An entry is only valid as long as the node's package database
+    fingerprint and the package mapping file are unchanged.
+    '''
+    def __init__(self, path=None):
+        cache_dir = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+        self.path = path or os.path.join(cache_dir, "ra-tester", "packages.json")
+        self.lock = threading.Lock()
+        self.entries = None
+
+    def load(self):
+        if self.entries is None:
+            try:
+                with open(self.path, "r") as f:
+                    self.entries = json.load(f)
+            except (IOError, OSError, ValueError):
+                self.entries = {}
+        return self.entries
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = "%s.%d" % (self.path, os.getpid())
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.rename(tmp, self.path)
+
+    def mapping_digest(self, mapping):
+        with open(mapping, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def is_fresh(self, node, fingerprint, mapping, pkgs):
+        '''True if all pkgs were checked on node and nothing changed since'''
+        if not fingerprint:
+            return False
+        with self.lock:
+            entry = self.load().get(node)
+        return entry is not None and \
+            entry["fingerprint"] == fingerprint and \
+            entry["mapping"] == self.mapping_digest(mapping) and \
+            set(pkgs).issubset(entry["packages"])
+
+    def record(self, node, fingerprint, mapping, pkgs):
+        if not fingerprint:
+            return
+        digest = self.mapping_digest(mapping)
+        with self.lock:
+            entry = self.load().get(node)
+            packages = set(pkgs)
+            # packages are never removed, previous checks still hold
+            if entry is not None and entry["mapping"] == digest:
+                packages.update(entry["packages"])
+            self.entries[node] = {"fingerprint": fingerprint,
+                                  "mapping": digest,
+                                  "packages": sorted(packages)}
+            self.save()
+
+
+package_cache = PackageCache()
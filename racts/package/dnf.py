@@ -17,3 +17,10 @@ class Dnf(Rpm):
     def _update(self, node, pkg):
         self.rsh_check(node, "dnf update -y %s" % pkg)
 
+    def updates_query(self, pkgs):
+        return "dnf -q repoquery --upgrades --qf '%%{NAME}' %s" % " ".join(pkgs)
+
+    def _ensure(self, node, pkgs):
+        # dnf install also upgrades the packages already installed
+        self.rsh_check(node, "dnf install -y %s" % " ".join(pkgs))
+
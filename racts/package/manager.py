@@ -26,6 +26,22 @@ class PackageManager(ABC):
     def _update(self, node, pkg):
         pass
 
+    @abstractmethod
+    def _query_state(self, node, pkgs):
+        '''State of all packages in a single query, as a dict
+        {pkg: "missing"|"outdated"|"current"}'''
+        pass
+
+    @abstractmethod
+    def _ensure(self, node, pkgs):
+        '''Install or update all packages in a single transaction'''
+        pass
+
+    @abstractmethod
+    def fingerprint(self, node):
+        '''Checksum of the node's package database, None if unknown'''
+        pass
+
     def map_package_name(self, pkg):
         ns = self.pkg_format + "-" + self.flavor
         table = self.mapping.get(ns, {})
@@ -47,3 +63,18 @@ class PackageManager(ABC):
 
     def update(self, node, pkg):
         return self._update(node, self.map_package_name(pkg))
+
+    def query_state(self, node, pkgs):
+        mapped = dict([(p, self.map_package_name(p)) for p in pkgs])
+        state = self._query_state(node, sorted(set(mapped.values())))
+        return dict([(p, state.get(mapped[p], "missing")) for p in pkgs])
+
+    def ensure(self, node, pkgs):
+        '''Make sure all packages are installed and up to date.
+        Return the state of the packages before the transaction'''
+        state = self.query_state(node, pkgs)
+        pending = sorted(set([self.map_package_name(p) for p in pkgs
+                              if state[p] != "current"]))
+        if pending:
+            self._ensure(node, pending)
+        return state
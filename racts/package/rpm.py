@@ -28,3 +28,30 @@ class Rpm(PackageManager, ActionMixin):
     def _update(self, node, pkg):
         self.rsh_check(node, "yum update -y %s" % pkg)
 
+    def updates_query(self, pkgs):
+        return "repoquery -a --pkgnarrow=updates --qf '%%{NAME}' %s" % " ".join(pkgs)
+
+    def _query_state(self, node, pkgs):
+        rc, lines = self.rsh(node,
+                             "for p in %s; do rpm -q --quiet $p && echo \"current $p\"; done; "
+                             "%s 2>/dev/null | sed 's/^/outdated /'; exit 0" %
+                             (" ".join(pkgs), self.updates_query(pkgs)),
+                             stdout=None)
+        assert rc == 0, "could not query state of packages %s" % pkgs
+        state = {}
+        for line in lines:
+            status, _, pkg = line.strip().partition(" ")
+            if pkg in pkgs and (status == "current" or pkg in state):
+                state[pkg] = status
+        return state
+
+    def fingerprint(self, node):
+        out = self.rsh(node,
+                       "stat -c '%n %s %Y' /var/lib/rpm/* /usr/lib/sysimage/rpm/* "
+                       "2>/dev/null | sha256sum", stdout=1)
+        return out.split()[0] if out.strip() else None
+
+    def _ensure(self, node, pkgs):
+        # yum install also updates the packages already installed
+        self.rsh_check(node, "yum install -y %s" % " ".join(pkgs))
+
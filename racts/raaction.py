@@ -26,7 +26,14 @@ Licensed under the GNU GPL.
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
 
 
+import re
+import socket
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+from racts.ctsoverride import control_masters
+from racts.ratrace import tracer
 
 
 class ActionMixin(object):
@@ -61,14 +68,36 @@ class ActionMixin(object):
         if self.verbose:
             self.logger.log("> [%s] %s" % (target, command))
         temp = "ratester-tmp%f" % time.time()
-        res = self.rsh(target, command + " &>" + temp)
-        if res != expected:
-            if type(res) is list:
-                res = res[0]
-            self.rsh(target, "mv %s '%s-%s-%d'" % (temp, temp, command, res))
-        else:
-            self.rsh(target, "rm -f %s" % temp)
-        assert res == expected, "\"%s\" returned %d" % (command, res)
+        # run the command and dispose of its output in a single call,
+        # the output is kept for inspection when the command failed
+        kept = "%s-%s" % (temp, re.sub(r"[^\w.,=:+-]", "_", command)[:128])
+        with tracer.remote(target, command):
+            res = self.rsh(target,
+                           "{ %s\n} &>%s; rc=$?; "
+                           "if [ $rc -ne %d ]; then mv %s %s-$rc; else rm -f %s; fi; "
+                           "exit $rc" % (command, temp, expected, temp, kept, temp))
+        if type(res) is list:
+            res = res[0]
+        assert res == expected, "%s: \"%s\" returned %d" % (self, command, res)
+
+    def run_on_nodes(self, fn, nodes, max_workers=None):
+        '''Call fn(node) concurrently on all nodes and return the results
+        in node order. Assertion failures are only reported once every
+        node is done, all together.'''
+        nodes = list(nodes)
+        if not nodes:
+            return []
+        with ThreadPoolExecutor(max_workers=max_workers or len(nodes)) as pool:
+            futures = [pool.submit(fn, node) for node in nodes]
+        results = []
+        failures = []
+        for node, future in zip(nodes, futures):
+            try:
+                results.append(future.result())
+            except AssertionError as e:
+                failures.append("[%s] %s" % (node, e))
+        assert not failures, "; ".join(failures)
+        return results
 
     def rsh_bg(self, target, command, expected=0):
         # TODO: multiple bg jobs per target
@@ -78,26 +107,73 @@ class ActionMixin(object):
         # self.rsh_check(target, "screen -S %s -X stuff '%s\r'"%(self.name,command) )
         self.rsh_check(target, "screen -S %s -d -m %s" % (self.name, command))
 
+    def wait_until(self, check, nodes, timeout, any_node=False, delay=0.2, max_delay=2):
+        '''Call check(node) concurrently on all nodes with an exponential
+        backoff, until it returns True for every node (or for one node
+        if any_node) or the deadline is reached. Return the nodes that
+        did not become ready.'''
+        nodes = list(nodes)
+        deadline = time.time() + timeout
+        done = threading.Event()
+
+        def wait(node):
+            pause = delay
+            while not done.is_set():
+                if check(node):
+                    if any_node:
+                        done.set()
+                    return True
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                done.wait(min(pause, remaining))
+                pause = min(pause * 2, max_delay)
+            return False
+        ready = self.run_on_nodes(wait, nodes)
+        if any_node and done.is_set():
+            return []
+        return [n for n, r in zip(nodes, ready) if not r]
+
     def rsh_until(self, targets, command, timeout=1000, expected=0):
         if self.verbose:
             self.logger.log("> [%s] %s -> UNTIL $? == %d" % (",".join(targets), command, expected))
-        while timeout > 0:
-            for t in targets:
-                res = self.rsh(t, command)
-                if res == expected:
-                    return
-            time.sleep(2)
-            timeout -= 2
-
-    def wait_until_restarted(self, node, timeout=300):
-        start = time.time()
-        alive = False
-        while not alive:
+        self.wait_until(lambda t: self.rsh(t, command) == expected, targets, timeout,
+                        any_node=True)
+
+    def boot_ids(self, nodes):
+        '''Current boot id of each node, to recognize a restart'''
+        return dict(zip(nodes, self.run_on_nodes(
+            lambda n: self.rsh(n, "cat /proc/sys/kernel/random/boot_id", stdout=1).strip(),
+            nodes)))
+
+    def is_reachable(self, node, boot_id=None):
+        # connecting to sshd is cheaper than spawning ssh, and it
+        # fails fast while the node is down
+        endpoint = control_masters.endpoint(self.rsh, node)
+        if endpoint:
+            try:
+                socket.create_connection(endpoint, 1).close()
+            except (OSError, socket.error):
+                return False
+        rc, lines = self.rsh(node, "cat /proc/sys/kernel/random/boot_id", stdout=None)
+        return rc == 0 and (boot_id is None or
+                            "".join(lines).strip() not in ("", boot_id))
+
+    def wait_until_reachable(self, nodes, timeout=300, boot_ids=None):
+        '''Wait until all nodes accept ssh connections again, and
+        restarted if their previous boot ids are given'''
+        boot_ids = boot_ids or {}
+        for node in nodes:
+            # the node's ssh control master died with the reboot
+            control_masters.invalidate(node)
+        late = self.wait_until(lambda n: self.is_reachable(n, boot_ids.get(n)), nodes, timeout)
+        assert not late, "Restart timeout exceeded on %s" % ",".join(late)
+
+    def wait_until_restarted(self, node, timeout=300, boot_id=None):
+        if boot_id is None:
+            # without a boot id, give the node time to go down
             time.sleep(3)
-            assert time.time() - start < timeout, "Restart timeout exceeded"
-            res = self.rsh(node, "true")
-            if res == 0:
-                alive = True
+        self.wait_until_reachable([node], timeout, {node: boot_id} if boot_id else None)
 
     def make_watch(self, patterns):
         watch = self.create_watch(patterns, self.Env["DeadTime"])
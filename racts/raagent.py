@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+
+'''Resource Agent Tester
+
+Remote execution through a persistent agent running on cluster nodes
+ '''
+
+__copyright__ = '''
+Copyright (C) 2020 Damien Ciabrini <dciabrin@redhat.com>
+Licensed under the GNU GPL.
+'''
+
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
+
+
+import base64
+import json
+import threading
+import time
+from subprocess import Popen, PIPE, DEVNULL
+from cts.remote import RemoteExec
+
+from racts.ratrace import tracer
+
+
+# The agent is sent on the ssh command line and runs with the node's
+# python interpreter (python2 on older distributions). It reads one
+# JSON request per line on stdin, runs all requests concurrently and
+# streams back one JSON message per output line, then the exit code.
+AGENT_SOURCE = r'''
+import base64, json, os, subprocess, sys, threading
+SHELL = "/bin/bash" if os.path.exists("/bin/bash") else "/bin/sh"
+lock = threading.Lock()
+
+def send(msg):
+    data = json.dumps(msg) + "\n"
+    with lock:
+        sys.stdout.write(data)
+        sys.stdout.flush()
+
+def pump(rid, name, stream):
+    for line in iter(stream.readline, b""):
+        send({"id": rid, name: line.decode("utf-8", "replace")})
+    stream.close()
+
+def run(req):
+    rid = req["id"]
+    env = dict(os.environ)
+    env.update(req.get("env") or {})
+    stdin = req.get("stdin")
+    try:
+        proc = subprocess.Popen(req["command"], shell=True, executable=SHELL, env=env,
+                                stdin=subprocess.PIPE if stdin is not None else open(os.devnull),
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
+    except Exception as e:
+        send({"id": rid, "stderr": "%s\n" % e})
+        send({"id": rid, "rc": 127})
+        return
+    readers = [threading.Thread(target=pump, args=(rid, n, s))
+               for n, s in (("stdout", proc.stdout), ("stderr", proc.stderr))]
+    for t in readers:
+        t.daemon = True
+        t.start()
+    if stdin is not None:
+        try:
+            proc.stdin.write(base64.b64decode(stdin))
+            proc.stdin.close()
+        except (IOError, OSError):
+            pass
+    for t in readers:
+        t.join()
+    send({"id": rid, "rc": proc.wait()})
+
+send({"ready": True})
+for line in iter(sys.stdin.readline, ""):
+    t = threading.Thread(target=run, args=(json.loads(line),))
+    t.daemon = True
+    t.start()
+'''
+
+
+class AgentRequest(object):
+    '''A command submitted to an agent, completed once its rc is known'''
+    def __init__(self, command):
+        self.command = command
+        self.stdout = []
+        self.stderr = []
+        self.rc = None
+        self.done = threading.Event()
+
+    def complete(self, rc):
+        self.rc = rc
+        self.done.set()
+
+    def wait(self):
+        self.done.wait()
+        return self.rc
+
+
+class RemoteAgent(object):
+    '''Client side of the agent running on a single node'''
+    def __init__(self, node, command):
+        self.node = node
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.next_id = 0
+        self.alive = True
+        self.ready = threading.Event()
+        self.proc = Popen(command, stdin=PIPE, stdout=PIPE, stderr=DEVNULL,
+                          close_fds=True, shell=True)
+        self.reader = threading.Thread(target=self.read_responses,
+                                       name="agent-%s" % node)
+        self.reader.daemon = True
+        self.reader.start()
+
+    def read_responses(self):
+        for line in iter(self.proc.stdout.readline, b""):
+            try:
+                msg = json.loads(line.decode())
+            except ValueError:
+                continue
+            if "ready" in msg:
+                self.ready.set()
+                continue
+            with self.lock:
+                req = self.pending.get(msg["id"])
+                if req is not None and "rc" in msg:
+                    del self.pending[msg["id"]]
+            if req is None:
+                continue
+            if "rc" in msg:
+                req.complete(msg["rc"])
+            elif "stdout" in msg:
+                req.stdout.append(msg["stdout"])
+            elif "stderr" in msg:
+                req.stderr.append(msg["stderr"])
+        # the ssh channel went away (e.g. the node got fenced), fail
+        # the pending requests like ssh would do
+        with self.lock:
+            self.alive = False
+            pending = list(self.pending.values())
+            self.pending.clear()
+        self.ready.set()
+        for req in pending:
+            req.complete(255)
+
+    def submit(self, command, env=None, stdin=None):
+        '''Send a command to the agent, None if the agent is gone'''
+        req = AgentRequest(command)
+        with self.lock:
+            if not self.alive:
+                return None
+            self.next_id += 1
+            msg = {"id": self.next_id, "command": command, "env": env}
+            if stdin is not None:
+                msg["stdin"] = base64.b64encode(stdin).decode()
+            self.pending[self.next_id] = req
+            try:
+                self.proc.stdin.write((json.dumps(msg) + "\n").encode())
+                self.proc.stdin.flush()
+            except (IOError, OSError):
+                del self.pending[self.next_id]
+                self.alive = False
+                return None
+        return req
+
+    def stop(self):
+        try:
+            self.proc.stdin.close()
+        except (IOError, OSError):
+            pass
+
+
+class AgentRemoteExec(RemoteExec):
+    '''RemoteExec that runs commands through a persistent agent on each
+    node instead of spawning a new ssh process per command.
+
+    Commands targeting a node without a running agent fall back to
+    plain ssh. A dead agent (e.g. the node got fenced) is restarted in
+    the background on the next command targeting its node.
+    '''
+    restart_interval = 30
+
+    def __init__(self, rsh, silent=False):
+        RemoteExec.__init__(self, rsh, silent)
+        self.lock = threading.Lock()
+        self.agents = {}
+        self.started = {}
+
+    def agent_command(self, node):
+        launcher = "import base64;exec(base64.b64decode('%s'))" % \
+            base64.b64encode(AGENT_SOURCE.encode()).decode()
+        remote = "exec $(command -v python3 || command -v python) -c \"%s\"" % launcher
+        # the agent reads its requests from stdin
+        ssh = " ".join([x for x in self.rsh.Command.split() if x != "-n"])
+        return "%s %s '%s'" % (ssh, node, self._fixcmd(remote))
+
+    def start_agent(self, node):
+        with self.lock:
+            self.started[node] = time.time()
+        # make sure the control master exists before opening the channel
+        proc, rc = self.ensure_control_master(node)
+        if rc != 0:
+            return None
+        agent = RemoteAgent(node, self.agent_command(node))
+        with self.lock:
+            self.agents[node] = agent
+        return agent
+
+    def start_agents(self, nodes, timeout=30):
+        '''Start an agent on every node that doesn't have a live one'''
+        agents = []
+        for node in nodes:
+            current = self.agents.get(node)
+            if current is None or not current.alive:
+                agents.append(self.start_agent(node))
+        deadline = time.time() + timeout
+        for node, agent in zip(nodes, agents):
+            if agent is None or \
+               not agent.ready.wait(max(0, deadline - time.time())) or \
+               not agent.alive:
+                self.log("Could not start remote agent on %s, using ssh" % node)
+                with self.lock:
+                    self.agents.pop(node, None)
+
+    def stop_agents(self):
+        with self.lock:
+            agents = list(self.agents.values())
+            self.agents.clear()
+            self.started.clear()
+        for agent in agents:
+            agent.stop()
+
+    def agent(self, node):
+        '''The live agent of a node, or None to use ssh'''
+        with self.lock:
+            agent = self.agents.get(node)
+            if agent is None or (agent.alive and agent.ready.is_set()):
+                return agent
+            restart = not agent.alive and \
+                time.time() - self.started.get(node, 0) > self.restart_interval
+            if restart:
+                self.started[node] = time.time()
+        if restart:
+            t = threading.Thread(target=self.start_agents, args=([node],),
+                                 name="agent-restart-%s" % node)
+            t.daemon = True
+            t.start()
+        return None
+
+    def complete(self, node, req, stdout=0, silent=False, completionDelegate=None):
+        rc = req.wait()
+        if not silent:
+            self.debug("cmd: target=%s, rc=%d: %s" % (node, rc, req.command))
+            for err in req.stderr:
+                self.debug("cmd: stderr: %s" % err)
+        if completionDelegate:
+            completionDelegate.async_complete(0, rc, req.stdout, req.stderr)
+        if stdout == 0:
+            if not silent:
+                for line in req.stdout:
+                    self.debug("cmd: stdout: %s" % line)
+            return rc
+        if stdout == 1:
+            return req.stdout[0] if req.stdout else ""
+        return (rc, req.stdout)
+
+    def complete_traced(self, node, req, completionDelegate, begin, tid):
+        rc = self.complete(node, req, 0, True, completionDelegate)
+        tracer.record(req.command.strip()[:60], "async", begin, time.time(), node,
+                      {"command": req.command, "rc": rc}, tid)
+
+    def complete_async(self, node, req, completionDelegate):
+        t = threading.Thread(target=self.complete_traced,
+                             args=(node, req, completionDelegate, time.time(), threading.get_ident()))
+        t.daemon = True
+        t.start()
+        return t
+
+    def call_async(self, node, command, completionDelegate=None):
+        agent = self.agent(node)
+        req = agent.submit(command) if agent else None
+        if req is None:
+            return RemoteExec.call_async(self, node, command, completionDelegate)
+        return self.complete_async(node, req, completionDelegate)
+
+    def call_with_input(self, node, command, data):
+        agent = self.agent(node)
+        if agent is None:
+            return RemoteExec.call_with_input(self, node, command, data)
+        with tracer.remote(node, command):
+            req = agent.submit(command, stdin=data)
+            if req is None:
+                return RemoteExec.call_with_input(self, node, command, data)
+            return (req.wait(), req.stdout, req.stderr)
+
+    def __call__(self, node, command, stdout=0, synchronous=1, silent=False, blocking=True, completionDelegate=None):
+        agent = self.agent(node)
+        if agent is None or not synchronous:
+            req = agent.submit(command) if agent else None
+            if req is None:
+                return RemoteExec.__call__(self, node, command, stdout, synchronous,
+                                           silent, blocking, completionDelegate)
+            self.complete_async(node, req, completionDelegate)
+            return 0
+        with tracer.remote(node, command):
+            req = agent.submit(command)
+            if req is None:
+                return RemoteExec.__call__(self, node, command, stdout, synchronous,
+                                           silent, blocking, completionDelegate)
+            return self.complete(node, req, stdout, silent, completionDelegate)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+
+'''Resource Agent Tester
+
+Catalog of the RA modules, scenarios and tests, built without any cluster
+ '''
+
+__copyright__ = '''
+Copyright (C) 2020 Damien Ciabrini <dciabrin@redhat.com>
+Licensed under the GNU GPL.
+'''
+
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
+
+
+import importlib
+import inspect
+import os
+import traceback
+from collections import namedtuple
+
+from racts.ratrace import startup_times
+
+TestInfo = namedtuple("TestInfo", ["module", "scenario", "name", "cls", "doc", "runtime_check"])
+
+
+def ra_module_dirs(root="ra"):
+    return sorted([d for d in os.listdir(root)
+                   if os.path.isfile(os.path.join(root, d, "__init__.py"))])
+
+
+class RAModule(object):
+    '''An RA module under ra/, known by the manifest of its package.
+
+    The manifest gives the names of the scenarios and tests, and the
+    other RA modules whose code is reused. The scenarios, tests and
+    fencing components are only imported from their submodules when
+    first used, so the modules that are not chosen cost nothing.
+    '''
+    def __init__(self, package):
+        self.package = package
+        self.name = package.name
+        self.manifest = package.manifest
+        self.loaded = {}
+
+    def __repr__(self):
+        return "<RAModule %s>" % self.name
+
+    @property
+    def scenarios(self):
+        return self.load("scenarios")
+
+    @property
+    def tests(self):
+        return self.load("tests")
+
+    @property
+    def fencing(self):
+        if "fencing" not in self.manifest:
+            return None
+        return self.load("fencing", self.manifest["fencing"])
+
+    def load(self, attribute, submodule=None):
+        '''attribute of the package's submodule, by default the
+        submodule of the same name'''
+        if attribute not in self.loaded:
+            with startup_times.measure("%s %s" % (self.name, attribute)):
+                module = importlib.import_module("%s.%s" % (self.package.__name__,
+                                                            submodule or attribute))
+            self.loaded[attribute] = getattr(module, attribute)
+            self.check_manifest(attribute)
+        return self.loaded[attribute]
+
+    def check_manifest(self, attribute):
+        if attribute == "tests":
+            names = [cls.name for cls in self.loaded["tests"]]
+        elif attribute == "scenarios":
+            names = list(self.loaded["scenarios"].keys())
+        else:
+            return
+        if names != self.manifest[attribute]:
+            print("Warning: %s %s %s don't match the manifest %s" %
+                  (self.name, attribute, names, self.manifest[attribute]))
+
+
+def load_ra_modules(names=None, root="ra"):
+    '''The RA modules, from their manifests only. When names are
+    given, only the modules with one of those names (case-insensitive),
+    unknown names are reported when selecting tests.'''
+    dirs = ra_module_dirs(root)
+    modules = []
+    with startup_times.measure("RA manifests"):
+        for d in dirs:
+            try:
+                modules.append(RAModule(importlib.import_module(root + "." + d)))
+            except (ImportError, AttributeError):
+                print("Error when importing RA module %s:" % d)
+                traceback.print_exc()
+                print()
+    for module in list(modules):
+        missing = [r for r in module.manifest.get("requires", []) if r not in dirs]
+        if missing:
+            print("Skipping RA module %s, it requires missing RA modules %s" % (module.name, missing))
+            modules.remove(module)
+    if names:
+        lowered = [n.lower() for n in names]
+        modules = [m for m in modules if m.name.lower() in lowered]
+    return modules
+
+
+def runtime_check(cls):
+    '''True if a test decides whether it is applicable by probing the cluster'''
+    from cts.CTStests import CTSTest
+    from racts.ratest import ResourceAgentTest
+    if getattr(cls, "applicability", None):
+        return True
+    return cls.is_applicable not in (CTSTest.is_applicable, ResourceAgentTest.is_applicable)
+
+
+def applicability_facts(modules):
+    '''Facts declared by all the tests of the modules, to gather
+    them along with the other node facts'''
+    facts = []
+    for module in modules:
+        for cls in module.tests:
+            facts.extend(getattr(cls, "applicability", []))
+    return facts
+
+
+def first_line(doc):
+    return (doc or "").strip().split("\n")[0]
+
+
+def catalog(modules, details=True):
+    '''{module name: {scenario: [TestInfo]}}, from the classes only.
+    Without details, only the manifests are read and no test gets
+    imported (cls and doc are None).'''
+    result = {}
+    for module in modules:
+        if details:
+            tests = [(cls.name, cls, first_line(inspect.getdoc(cls)), runtime_check(cls))
+                     for cls in module.tests]
+        else:
+            tests = [(name, None, None, False) for name in module.manifest["tests"]]
+        result[module.name] = {}
+        for scenario in module.manifest["scenarios"]:
+            result[module.name][scenario] = [TestInfo(module.name, scenario, *t) for t in tests]
+    return result
+
+
+def parse_choices(choices):
+    '''{module: {scenario or None: [test prefixes]}} from --choose values
+    (Module, Module:Scenario or Module:Scenario:Test, comma separated)'''
+    chosen = {}
+    for name in sum([c.split(",") for c in choices], []):
+        module, _, rest = name.partition(":")
+        scenario, _, test = rest.partition(":")
+        tests = chosen.setdefault(module, {}).setdefault(scenario or None, [])
+        if test:
+            tests.append(test)
+    return chosen
+
+
+def select(tests, choices):
+    '''Tests of the catalog matching the --choose values, and the values
+    that don't match anything'''
+    if not choices:
+        return (sum([sum(s.values(), []) for s in tests.values()], []), [])
+    selected = []
+    invalid = []
+    for module, scenarios in parse_choices(choices).items():
+        if module not in tests:
+            invalid.append(module)
+            continue
+        for scenario, prefixes in scenarios.items():
+            if scenario is not None and scenario not in tests[module]:
+                invalid.append("%s:%s" % (module, scenario))
+                continue
+            for s in [scenario] if scenario else tests[module].keys():
+                matching = [t for t in tests[module][s]
+                            if not prefixes or any([t.name.startswith(p) for p in prefixes])]
+                invalid += ["%s:%s:%s" % (module, s, p) for p in prefixes
+                            if not any([t.name.startswith(p) for t in tests[module][s]])]
+                selected += [t for t in matching if t not in selected]
+    return (selected, invalid)
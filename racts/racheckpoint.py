@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+'''Resource Agent Tester
+
+Checkpoints of a run, to resume it after an interruption
+ '''
+
+__copyright__ = '''
+Copyright (C) 2020 Damien Ciabrini <dciabrin@redhat.com>
+Licensed under the GNU GPL.
+'''
+
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
+
+
+import hashlib
+import json
+import os
+import threading
+import xml.etree.ElementTree as ET
+
+
+# crm_config options updated by the cluster itself
+VOLATILE_OPTIONS = ("last-lrm-refresh",)
+
+
+def configuration_skeleton(xml):
+    '''CIB configuration without the resources and constraints, which
+    tests create and delete, and without the volatile cluster options'''
+    configuration = ET.fromstring(xml)
+    for section in ("resources", "constraints"):
+        for element in configuration.findall(section):
+            configuration.remove(element)
+    for parent in configuration.iter():
+        for nvpair in parent.findall("nvpair"):
+            if nvpair.get("name") in VOLATILE_OPTIONS:
+                parent.remove(nvpair)
+    return ET.tostring(configuration, encoding="unicode")
+
+
+def scenario_fingerprint(module, scenario, components, nodes, configuration):
+    '''Digest of what the setup of a scenario left on a cluster'''
+    digest = hashlib.sha256()
+    for item in [module, scenario] + [type(c).__name__ for c in components] + list(nodes):
+        digest.update(item.encode() + b"\0")
+    digest.update(configuration_skeleton(configuration).encode())
+    return digest.hexdigest()
+
+
+class Checkpoint(object):
+    '''State of a run, saved in checkpoint.json in the run directory
+    after each test: the selection, the random seed, the tests already
+    completed and the fingerprint of the scenarios currently set up.
+
+    A run resumed from its checkpoint skips the completed tests, and
+    the setup of the scenarios that are still set up on their cluster.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.path = None
+        self.data = {"selection": [], "seed": None, "test_order": None,
+                     "completed": [], "scenarios": {}}
+        self.completed = set()
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def open(self, directory, resume=False):
+        '''Use the checkpoint of a run directory. When resuming, load the
+        state of the interrupted run, return False if there is none'''
+        self.path = os.path.join(directory, "checkpoint.json")
+        if not resume:
+            return True
+        try:
+            with open(self.path, "r") as f:
+                self.data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return False
+        self.completed = set([tuple(c[:4]) for c in self.data["completed"]])
+        return True
+
+    def save(self):
+        tmp = "%s.%d" % (self.path, os.getpid())
+        with open(tmp, "w") as f:
+            json.dump(self.data, f, indent=1, sort_keys=True)
+        os.rename(tmp, self.path)
+
+    def start(self, selection, seed, test_order):
+        '''Record the selection of a new run, a resumed run keeps its own'''
+        if not self.enabled:
+            return
+        with self.lock:
+            if not self.data["selection"]:
+                self.data["selection"] = selection
+                self.data["seed"] = seed
+                self.data["test_order"] = test_order
+            self.save()
+
+    def is_completed(self, module, scenario, test, iteration):
+        return (module, scenario, test, iteration) in self.completed
+
+    def test_completed(self, module, scenario, test, iteration, status):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.completed.add((module, scenario, test, iteration))
+            self.data["completed"].append([module, scenario, test, iteration, status])
+            self.save()
+
+    def scenario_key(self, module, scenario, nodes):
+        return "%s:%s:%s" % (module, scenario, ",".join(nodes))
+
+    def scenario(self, module, scenario, nodes):
+        '''(fingerprint, baseline CIB) of a scenario still set up on
+        the nodes, or None'''
+        with self.lock:
+            entry = self.data["scenarios"].get(self.scenario_key(module, scenario, nodes))
+        return (entry["fingerprint"], entry["baseline"]) if entry else None
+
+    def scenario_set_up(self, module, scenario, nodes, fingerprint, baseline):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.data["scenarios"][self.scenario_key(module, scenario, nodes)] = \
+                {"fingerprint": fingerprint, "baseline": baseline}
+            self.save()
+
+    def scenario_torn_down(self, module, scenario, nodes):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.data["scenarios"].pop(self.scenario_key(module, scenario, nodes), None)
+            self.save()
+
+
+checkpoint = Checkpoint()
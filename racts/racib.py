@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+'''Resource Agent Tester
+
+CIB snapshots, to reset a cluster between tests without deleting
+and recreating the tested resources
+ '''
+
+__copyright__ = '''
+Copyright (C) 2020 Damien Ciabrini <dciabrin@redhat.com>
+Licensed under the GNU GPL.
+'''
+
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
+
+
+import xml.etree.ElementTree as ET
+
+from cts.logging import LogFactory
+
+
+class CIBSnapshots(object):
+    '''Snapshots of the CIB configuration of a cluster.
+
+    The baseline is the configuration right after scenario setup. When
+    a test creates its resources, the resulting configuration (stopped
+    resources) is saved under a key describing their definition. At
+    teardown, that snapshot is restored instead of deleting the
+    resources, so the next test can reuse them if it has the same
+    definition.
+    '''
+    def __init__(self, cluster_manager, nodes, timeout):
+        self.cluster_manager = cluster_manager
+        self.nodes = nodes
+        self.node = nodes[0]
+        self.timeout = timeout
+        self.logger = LogFactory()
+        self.baseline = None
+        self.baseline_attributes = set()
+        self.snapshots = {}
+        self.current = None
+        self.resources = []
+
+    def transient_attributes(self):
+        '''(node, attribute) of all the transient node attributes'''
+        status = ET.fromstring(self.cluster_manager.cib_query(self.node, "status"))
+        attributes = set()
+        for node_state in status.iter("node_state"):
+            for attrs in node_state.iter("transient_attributes"):
+                for nvpair in attrs.iter("nvpair"):
+                    attributes.add((node_state.get("uname"), nvpair.get("name")))
+        return attributes
+
+    def capture_baseline(self):
+        self.baseline = self.cluster_manager.cib_query(self.node, "configuration")
+        self.baseline_attributes = self.transient_attributes()
+
+    def record(self, key, resources):
+        '''Save the configuration of freshly created (stopped) resources'''
+        self.snapshots[key] = self.cluster_manager.cib_query(self.node, "configuration")
+        self.current = key
+        self.resources = resources
+
+    def restore(self):
+        '''Reset the resources to the state they had when created'''
+        self.logger.log("Restoring CIB snapshot of resources %s" % self.resources)
+        self.replace(self.snapshots[self.current])
+        self.cleanup()
+
+    def restore_baseline(self):
+        '''Remove the resources created since scenario setup'''
+        self.logger.log("Restoring baseline CIB")
+        self.replace(self.baseline)
+        self.cleanup()
+        self.current = None
+        self.resources = []
+
+    def replace(self, xml):
+        self.cluster_manager.cib_replace_configuration(self.node, xml)
+        self.wait_for_idle()
+
+    def cleanup(self):
+        # failcounts and operation history of the tested resources
+        for rsc in self.resources:
+            self.cluster_manager.rsh_check(self.node, "crm_resource --cleanup -r %s" % rsc)
+        # node attributes set during the test
+        stale = sorted(self.transient_attributes() - self.baseline_attributes)
+        commands = ["crm_attribute -N %s -l reboot -D -n %s" % (node, name)
+                    for node, name in stale if not name.startswith("#")]
+        if commands:
+            self.cluster_manager.rsh_check(self.node, " && ".join(commands))
+        self.wait_for_idle()
+        for rsc in self.resources:
+            rc, lines = self.cluster_manager.rsh(self.node, "crm_resource --locate -r %s" % rsc,
+                                                 stdout=None)
+            running = [x.strip() for x in lines if " is running on" in x]
+            assert not running, "CIB restore did not converge: %s" % running
+
+    def wait_for_idle(self):
+        self.cluster_manager.wait_for_idle(self.node, self.timeout)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+'''Resource Agent Tester
+
+Structured pacemaker operation results parsed from controller logs
+ '''
+
+__copyright__ = '''
+Copyright (C) 2020 Damien Ciabrini <dciabrin@redhat.com>
+Licensed under the GNU GPL.
+'''
+
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
+
+
+import re
+import time
+
+
+OPERATIONS = "start|stop|monitor|promote|demote|notify|migrate_to|migrate_from|" \
+             "reload|reload-agent|meta-data|validate-all|cancel"
+
+# pacemaker 2: "Result of promote operation for galera on node1: 0 (ok) | call=..."
+RESULT_RE = re.compile(r"(?:crmd|pacemaker-controld).*?:\s*Result of (?P<op>\S+) operation "
+                       r"for (?P<resource>\S+) on (?P<node>\S+?): (?P<result>.*)$")
+RC_STATUS_RE = re.compile(r"(?P<rc>\d+) \((?P<status>[^)]*)\)")
+
+# pacemaker 1: "Operation galera_promote_0: ok (node=node1, call=25, rc=0, ..., confirmed=true)"
+OPERATION_RE = re.compile(r"(?:crmd|pacemaker-controld).*?:\s*Operation (?P<resource>\S+)_"
+                          r"(?P<op>%s)_(?P<interval>\d+): (?P<status>[^(]*?) "
+                          r"\(node=(?P<node>[^,]+),(?P<details>.*),\s*confirmed=true\)" % OPERATIONS)
+
+CALL_RE = re.compile(r"call=(\d+)")
+RC_RE = re.compile(r"rc=(\d+)")
+
+LITERAL_RE = re.compile(r"[\w.-]+$")
+
+
+class OpResult(object):
+    '''Result of a resource operation, as logged by the controller'''
+    def __init__(self, op, resource, node, status, rc=None, call_id=None, timestamp=None):
+        self.op = op
+        self.resource = resource
+        self.node = node
+        self.status = status
+        self.rc = rc
+        self.call_id = call_id
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return "OpResult(%s %s on %s: %s)" % (self.op, self.resource, self.node, self.status)
+
+
+def parse_timestamp(line):
+    '''Epoch of a syslog-style line ("Oct 18 08:40:37 ..."), or None'''
+    try:
+        stamp = time.strptime("%d %s" % (time.localtime().tm_year, line[:15]), "%Y %b %d %H:%M:%S")
+    except ValueError:
+        return None
+    return time.mktime(stamp)
+
+
+def to_int(match):
+    return int(match.group(1)) if match else None
+
+
+def parse_op_result(line):
+    '''The OpResult logged in line, or None'''
+    if "peration" not in line:
+        return None
+    m = RESULT_RE.search(line)
+    if m:
+        result = m.group("result")
+        rc_status = RC_STATUS_RE.match(result)
+        if rc_status:
+            rc, status = int(rc_status.group("rc")), rc_status.group("status")
+        else:
+            rc, status = None, result.split(" | ")[0].strip()
+        return OpResult(m.group("op"), m.group("resource"), m.group("node"), status,
+                        rc, to_int(CALL_RE.search(result)), parse_timestamp(line))
+    m = OPERATION_RE.search(line)
+    if m:
+        op = m.group("op")
+        if op == "monitor" and m.group("interval") == "0":
+            op = "probe"
+        details = m.group("details")
+        return OpResult(op, m.group("resource"), m.group("node"), m.group("status"),
+                        to_int(RC_RE.search(details)), to_int(CALL_RE.search(details)),
+                        parse_timestamp(line))
+    return None
+
+
+def op_results(lines):
+    '''OpResults of all the lines that log one (e.g. watch.matched)'''
+    return [r for r in (parse_op_result(x) for x in lines or []) if r]
+
+
+def op_latency(result, begin, end):
+    '''Seconds between begin and the time the controller logged the
+    operation result. The log is read up to a few seconds late, so use
+    the log timestamp when it is consistent with the time the line got
+    read (end)'''
+    if result.timestamp is None:
+        return end - begin
+    # log timestamps are truncated to the second
+    return min(end - begin, max(0, result.timestamp + 1 - begin))
+
+
+class OpExpect(str):
+    '''Expect an operation result in the logs.
+
+    The string value is a regex matching the controller log line, so
+    an OpExpect can be used wherever a watch pattern is expected. Log
+    watchers parse each line into an OpResult only once, and look the
+    expectations up by (resource, operation).
+    '''
+    def __new__(cls, operation, resource, node, status):
+        regex = r"(crmd|pacemaker-controld).*:\s*(Result\sof\s%s\soperation\sfor\s%s\son\s%s.*%s|"\
+                r"Operation %s_%s.*:\s*%s \(node=%s,.*,\s*confirmed=true\))" % \
+            (operation, resource, node, status, resource,
+             "monitor" if operation == "probe" else operation, status, node)
+        expect = str.__new__(cls, regex)
+        expect.operation = operation
+        expect.resource = resource
+        expect.node = node
+        expect.status = status
+        # resources and nodes can be given as regexes
+        expect.resource_re = None if LITERAL_RE.match(resource) else re.compile(resource + "$")
+        expect.node_re = None if LITERAL_RE.match(node) else re.compile(node + "$")
+        expect.status_re = re.compile(status)
+        return expect
+
+    def key(self):
+        '''Index of the expectation, None stands for any resource'''
+        return (None if self.resource_re else self.resource, self.operation)
+
+    def matches(self, result):
+        return result.op == self.operation and \
+            (self.resource_re.match(result.resource) if self.resource_re
+             else result.resource == self.resource) and \
+            (self.node_re.match(result.node) if self.node_re else result.node == self.node) and \
+            self.status_re.search(result.status) is not None
+
+
+def expect_ops(operation, resource, nodes, status):
+    '''Expect an operation result on all the nodes'''
+    return [OpExpect(operation, resource, n, status) for n in nodes]
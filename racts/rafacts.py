@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+'''Resource Agent Tester
+
+Facts about cluster nodes, gathered once per node and cached for the run
+ '''
+
+__copyright__ = '''
+Copyright (C) 2020 Damien Ciabrini <dciabrin@redhat.com>
+Licensed under the GNU GPL.
+'''
+
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
+
+
+import hashlib
+import shlex
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cts.remote import RemoteFactory
+
+from racts.ctsoverride import control_masters
+
+
+# One key=value line per fact. lsb_release fields are prefixed
+# with "lsb." (e.g. "lsb.Distributor ID=CentOS")
+FACTS_SCRIPT = '''
+echo "hostname=$(hostname)"
+echo "fqdn=$(getent ahosts %(node)s | awk '/STREAM/ {print $3;exit}')"
+echo "fqdn_ipv6=$(getent ahosts %(node)s.v6 | awk '/STREAM/ {print $3;exit}')"
+echo "ip=$(getent ahosts %(node)s | awk '/STREAM/ {print $1;exit}')"
+echo "ipv6=$(getent ahosts %(node)s.v6 | awk '/STREAM/ {print $1;exit}')"
+lsb_release -a 2>/dev/null | sed -n 's/^\\([^:]*\\):[[:space:]]*/lsb.\\1=/p'
+echo "pacemaker_version=$(pacemakerd --version 2>/dev/null | awk 'NR==1 {print $2}')"
+echo "container_engines=$(for e in docker podman; do $e --version >/dev/null 2>&1 && echo $e; done | tr '\\n' ' ')"
+'''
+
+
+def version_tuple(version):
+    '''Leading numeric components of a version string, e.g.
+    "10.3.27-3.el8" gives (10, 3, 27)'''
+    numbers = []
+    for part in version.split("-")[0].split("."):
+        digits = ""
+        for c in part:
+            if not c.isdigit():
+                break
+            digits += c
+        if not digits:
+            break
+        numbers.append(int(digits))
+    return tuple(numbers)
+
+
+class Fact(object):
+    '''A fact a test needs to decide whether it is applicable.
+
+    The shell snippet prints a single key=value line, it is gathered
+    along with the other facts of the node. The predicate is then
+    evaluated locally on the value.
+    '''
+    def __init__(self, command):
+        self.command = command
+        self.key = "check.%s" % hashlib.sha1(self.describe().encode()).hexdigest()[:12]
+
+    def script(self):
+        return 'echo "%s=$( { %s; } >/dev/null 2>&1; echo $?)"\n' % (self.key, self.command)
+
+    def holds(self, value):
+        return value == "0"
+
+    def describe(self):
+        return "command: %s" % self.command
+
+
+class CommandRc(Fact):
+    '''A command succeeds on the node'''
+
+
+class FileContains(Fact):
+    '''A file on the node contains some text, e.g. a resource
+    agent supports some parameter'''
+    def __init__(self, path, text):
+        self.path = path
+        self.text = text
+        Fact.__init__(self, "grep -qF -- %s %s" % (shlex.quote(text), shlex.quote(path)))
+
+    def describe(self):
+        return "%s contains \"%s\"" % (self.path, self.text)
+
+
+class PackageVersion(Fact):
+    '''A package is installed on the node, with a version in
+    [at_least, below)'''
+    def __init__(self, package, at_least=None, below=None):
+        self.package = package
+        self.at_least = at_least
+        self.below = below
+        Fact.__init__(self, None)
+
+    def script(self):
+        package = shlex.quote(self.package)
+        return ("v=$(rpm -q --qf '%%{VERSION}' %s 2>/dev/null) || "
+                "v=$(dpkg-query -W -f='${Version}' %s 2>/dev/null) || v=\"\"\n"
+                "echo \"%s=$v\"\n") % (package, package, self.key)
+
+    def holds(self, value):
+        if not value:
+            return False
+        version = version_tuple(value)
+        if self.at_least and version < version_tuple(self.at_least):
+            return False
+        if self.below and version >= version_tuple(self.below):
+            return False
+        return True
+
+    def describe(self):
+        bounds = [x for x in [self.at_least and ">= %s" % self.at_least,
+                              self.below and "< %s" % self.below] if x]
+        return "package %s %s" % (self.package, " ".join(bounds) or "installed")
+
+
+class NodeFacts(object):
+    '''Cache of the facts about each node (hostname, FQDNs, IPs, distro,
+    pacemaker version, available container engines).
+
+    All the facts of a node are gathered by a single remote call, and
+    forgotten when the node gets fenced or rebooted. Tests register the
+    additional facts they need with require(), before the first gather
+    if possible so they don't cost another call.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.facts = {}
+        self.node_locks = {}
+        self.required = {}
+
+    def require(self, facts):
+        with self.lock:
+            for fact in facts:
+                self.required[fact.key] = fact
+
+    def node_lock(self, node):
+        with self.lock:
+            return self.node_locks.setdefault(node, threading.Lock())
+
+    def gather(self, node):
+        '''Facts of a node, as a dict. Connection errors are not cached'''
+        with self.node_lock(node):
+            with self.lock:
+                cached = self.facts.get(node)
+                missing = [f for k, f in sorted(self.required.items())
+                           if cached is None or k not in cached]
+            if cached is not None and not missing:
+                return cached
+            script = FACTS_SCRIPT % {"node": shlex.quote(node)} if cached is None else ""
+            script += "".join([f.script() for f in missing]) + "exit 0\n"
+            rsh = RemoteFactory().getInstance()
+            rc, lines = rsh(node, script, stdout=None, silent=True)
+            facts = dict(cached or {})
+            facts.update(dict([x.rstrip("\n").split("=", 1) for x in lines if "=" in x]))
+            if rc == 0:
+                with self.lock:
+                    self.facts[node] = facts
+            return facts
+
+    def gather_all(self, nodes):
+        '''Gather the facts of several nodes concurrently'''
+        nodes = list(nodes)
+        if nodes:
+            with ThreadPoolExecutor(max_workers=len(nodes)) as pool:
+                list(pool.map(self.gather, nodes))
+
+    def get(self, node, key, default=""):
+        return self.gather(node).get(key, default)
+
+    def check(self, node, facts):
+        '''True if all the facts hold on the node'''
+        self.require(facts)
+        values = self.gather(node)
+        return all([f.holds(values.get(f.key, "")) for f in facts])
+
+    def invalidate(self, node):
+        with self.lock:
+            self.facts.pop(node, None)
+
+
+node_facts = NodeFacts()
+control_masters.add_listener(node_facts.invalidate)
@@ -51,6 +51,8 @@ class RATesterFencingComponent(RATesterScenarioComponent):
 
 class RATesterDefaultFencing(RATesterFencingComponent):
     def setup_scenario(self, cluster_manager):
+        if self.resumed():
+            return
         cluster_manager.log("Enabling fencing in cluster")
         self.rsh_check(self.Env["nodes"][0], "pcs stonith create fence %s %s action=reboot" %
                        (self.Env["stonith-type"],
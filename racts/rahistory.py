@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+'''Resource Agent Tester
+
+History of the test durations and outcomes, to order tests and estimate run times
+ '''
+
+__copyright__ = '''
+Copyright (C) 2020 Damien Ciabrini <dciabrin@redhat.com>
+Licensed under the GNU GPL.
+'''
+
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
+
+
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from racts.rafacts import node_facts
+
+
+# how many of the latest runs of a test are used for estimates
+RECENT_RUNS = 20
+RECENT_MATCHES = 50
+
+ORDERS = ("definition", "fail-fast", "shortest", "setup")
+
+Estimate = namedtuple("Estimate", ["duration", "failure_rate", "runs"])
+
+
+def test_key(module, scenario, test):
+    return "%s:%s:%s" % (module, scenario, test.name)
+
+
+def platform(node):
+    '''(distro, pacemaker version) of a node, history is kept per platform'''
+    distro = "%s %s" % (node_facts.get(node, "lsb.Distributor ID").strip(),
+                        node_facts.get(node, "lsb.Release").strip())
+    return (distro, node_facts.get(node, "pacemaker_version"))
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "%dh%02dm%02ds" % (hours, minutes, seconds) if hours else "%dm%02ds" % (minutes, seconds)
+
+
+class TestHistory(object):
+    '''Local SQLite database of the durations and outcomes of the
+    tests run so far, keyed by module:scenario:test, distro and
+    pacemaker version. It also keeps how long the log patterns
+    took to match, for adaptive watch timeouts.
+
+    Estimates come from the latest runs on the same platform, or
+    from the latest runs on any platform if the test never ran on
+    this one.
+    '''
+    def __init__(self, path=None):
+        cache_dir = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+        self.path = path or os.path.join(cache_dir, "ra-tester", "history.sqlite")
+        self.lock = threading.Lock()
+        self.db = None
+
+    def connect(self):
+        if self.db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # results are recorded by the scheduler's cluster threads
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS runs ("
+                            "key TEXT, distro TEXT, pacemaker TEXT, "
+                            "start REAL, duration REAL, status TEXT)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS runs_key ON runs (key, distro, pacemaker)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS matches ("
+                            "family TEXT, distro TEXT, pacemaker TEXT, "
+                            "start REAL, latency REAL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS matches_family "
+                            "ON matches (family, distro, pacemaker)")
+        return self.db
+
+    def record(self, result, distro, pacemaker):
+        '''Save a test result (see raresults.test_result)'''
+        if result["status"] == "skipped":
+            return
+        key = "%s:%s:%s" % (result["module"], result["scenario"], result["test"])
+        with self.lock:
+            db = self.connect()
+            with db:
+                db.execute("INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                           (key, distro, pacemaker, result["start"],
+                            result["duration"], result["status"]))
+
+    def record_matches(self, latencies, distro, pacemaker):
+        '''Save how long log patterns took to match, as a list
+        of (pattern family, seconds)'''
+        now = time.time()
+        with self.lock:
+            db = self.connect()
+            with db:
+                db.executemany("INSERT INTO matches VALUES (?, ?, ?, ?, ?)",
+                               [(family, distro, pacemaker, now, latency)
+                                for family, latency in latencies])
+
+    def latencies(self, family, distro, pacemaker, limit=RECENT_MATCHES):
+        '''Latest match latencies of a pattern family on a platform'''
+        with self.lock:
+            db = self.connect()
+            rows = db.execute("SELECT latency FROM matches "
+                              "WHERE family = ? AND distro = ? AND pacemaker = ? "
+                              "ORDER BY start DESC LIMIT ?",
+                              (family, distro, pacemaker, limit)).fetchall()
+        return [latency for latency, in rows]
+
+    def estimate(self, key, distro, pacemaker):
+        '''Estimate of a test, or None if it never ran'''
+        with self.lock:
+            db = self.connect()
+            rows = db.execute("SELECT duration, status FROM runs "
+                              "WHERE key = ? AND distro = ? AND pacemaker = ? "
+                              "ORDER BY start DESC LIMIT ?",
+                              (key, distro, pacemaker, RECENT_RUNS)).fetchall()
+            if not rows:
+                rows = db.execute("SELECT duration, status FROM runs WHERE key = ? "
+                                  "ORDER BY start DESC LIMIT ?",
+                                  (key, RECENT_RUNS)).fetchall()
+        if not rows:
+            return None
+        # a failed test usually stops early, it doesn't tell how long it takes
+        passed = [d for d, status in rows if status == "passed"] or [d for d, _ in rows]
+        failed = len([s for _, s in rows if s != "passed"])
+        return Estimate(sum(passed) / len(passed), failed / len(rows), len(rows))
+
+    def estimates(self, module, scenario, tests, distro, pacemaker):
+        return dict([(t.name, self.estimate(test_key(module, scenario, t), distro, pacemaker))
+                     for t in tests])
+
+    def order(self, module, scenario, tests, order, distro, pacemaker):
+        '''Tests of a scenario, in the requested order:
+        definition: order of the module's test list
+        fail-fast:  tests that failed most often recently come first
+        shortest:   shortest tests first, tests never run come last
+        setup:      tests sharing the same setup code run in a row
+        '''
+        tests = list(tests)
+        if order == "setup":
+            groups = {}
+            for t in tests:
+                groups.setdefault(getattr(type(t), "setup_test", None), []).append(t)
+            return sum(groups.values(), [])
+        if order not in ("fail-fast", "shortest"):
+            return tests
+        estimates = self.estimates(module, scenario, tests, distro, pacemaker)
+        if order == "fail-fast":
+            return sorted(tests, key=lambda t: -(estimates[t.name] or Estimate(0, 0, 0)).failure_rate)
+        return sorted(tests, key=lambda t: estimates[t.name].duration
+                      if estimates[t.name] else float("inf"))
+
+    def eta(self, module, scenario, tests, distro, pacemaker):
+        '''(estimated duration, number of tests with a history)'''
+        estimates = self.estimates(module, scenario, tests, distro, pacemaker)
+        known = [estimates[t.name].duration for t in tests if estimates[t.name]]
+        return (sum(known), len(known))
+
+
+test_history = TestHistory()
@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+
+'''Resource Agent Tester
+
+Streaming journal followers, to watch the nodes' logs without polling
+ '''
+
+__copyright__ = '''
+Copyright (C) 2020 Damien Ciabrini <dciabrin@redhat.com>
+Licensed under the GNU GPL.
+'''
+
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
+
+
+import itertools
+import json
+import os
+import shlex
+import signal
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime
+from subprocess import Popen, PIPE, DEVNULL
+from cts.remote import RemoteFactory
+from cts.watcher import SearchObj
+from cts.logging import LogFactory
+
+from racts.ctsoverride import control_masters
+from racts.ramatcher import required_words
+
+
+RESUME_MARK = "__RATESTER_RESUME__"
+
+
+def pushdown_words(patterns):
+    '''Words prefiltering the lines of interest for patterns, or None
+    if some pattern can't be prefiltered'''
+    words = set()
+    for pattern in patterns:
+        required = required_words(pattern)
+        if required is None:
+            return None
+        words.update(required)
+    return words
+
+
+def covers(words, others):
+    '''True if a line matching any of others also matches words'''
+    if words is None:
+        return True
+    if others is None:
+        return False
+    return all(any(w in o for w in words) for o in others)
+
+
+def format_journal_entry(entry):
+    '''Render a journal JSON entry like journalctl's short output'''
+    stamp = datetime.fromtimestamp(int(entry.get("__REALTIME_TIMESTAMP", 0)) / 1e6)
+    ident = entry.get("SYSLOG_IDENTIFIER") or entry.get("_COMM") or "unknown"
+    pid = entry.get("SYSLOG_PID") or entry.get("_PID")
+    message = entry.get("MESSAGE") or ""
+    # binary messages are serialized as an array of bytes
+    if isinstance(message, list):
+        message = bytes(message).decode("utf-8", "replace")
+    return "%s %s %s%s: %s" % (stamp.strftime("%b %d %H:%M:%S"),
+                               entry.get("_HOSTNAME", "localhost"),
+                               ident, "[%s]" % pid if pid else "",
+                               message.replace("\n", " "))
+
+
+class JournalStream(object):
+    '''A persistent "journalctl -f" on a node, feeding a ring buffer.
+
+    Every line received gets a sequence number, readers keep track
+    of the last sequence number they consumed. The stream reconnects
+    automatically when the ssh connection drops (e.g. the node got
+    fenced), and resumes after the last journal entry received.
+
+    Only the lines containing a word required by the patterns of the
+    active watchers are sent by the node. The stream is restarted
+    when a new watcher needs lines that the current filter drops.
+    The restarted stream only keeps the older lines matching the
+    previous filter, so adding a filter waits until the new stream
+    is past its resume mark: every line logged afterwards is sent.
+    '''
+    max_delay = 10
+
+    def __init__(self, node, rsh, maxlen=100000):
+        self.node = node
+        self.rsh = rsh
+        self.logger = LogFactory()
+        self.cond = threading.Condition()
+        self.lines = deque(maxlen=maxlen)
+        self.next_seq = 0
+        self.last_received = 0
+        self.cursor = None
+        self.proc = None
+        self.stopped = False
+        self.restarting = False
+        # the current process sends all the lines matching live_words
+        # that are logged from now on
+        self.live = False
+        self.live_words = None
+        self.filters = {}
+        self.next_filter = 0
+        self.words = None
+        self.lines_received = 0
+        self.bytes_received = 0
+        self.connected = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="journal-%s" % node)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def wanted_words(self):
+        '''Union of the active filters, None to get all lines'''
+        words = set()
+        for f in self.filters.values():
+            if f is None:
+                return None
+            words.update(f)
+        return words if self.filters else None
+
+    def add_filter(self, words):
+        '''Register the words needed by a watcher, return a token
+        to remove them'''
+        with self.cond:
+            self.next_filter += 1
+            token = self.next_filter
+            self.filters[token] = words
+            # widen the filter, or start filtering an unfiltered stream
+            restart = not covers(self.words, words) or \
+                (self.words is None and self.wanted_words() is not None)
+            if restart:
+                self.restarting = True
+                proc = self.proc
+        if restart and proc:
+            # resuming from the last cursor, no line is lost
+            self.kill(proc)
+        if restart:
+            with self.cond:
+                ready = self.cond.wait_for(lambda: self.stopped or
+                                           (self.live and covers(self.live_words, words)),
+                                           self.max_delay)
+            if not ready:
+                self.logger.debug("journal stream of %s not restarted with the new filter after %ds"
+                                  % (self.node, self.max_delay))
+        return token
+
+    def remove_filter(self, token):
+        # the current process keeps its filter, it is only a superset
+        with self.cond:
+            self.filters.pop(token, None)
+
+    def command(self):
+        '''Command following the journal, whether its first line is
+        only there to get a starting cursor, and the filter of the
+        previous command'''
+        bootstrap = False
+        previous = self.words
+        if self.cursor is None:
+            # the last existing entry gives the initial cursor
+            follow = "journalctl -f -o json -n 1"
+            bootstrap = True
+        elif self.cursor == "":
+            # the previous cursor is unknown to the node, the journal
+            # was probably lost across a reboot
+            follow = "journalctl -f -o json -b"
+        else:
+            follow = "journalctl -f -o json --after-cursor=%s" % shlex.quote(self.cursor)
+        self.words = self.wanted_words()
+        if self.words is not None:
+            grep = "exec grep --line-buffered -F %s" % \
+                " ".join(["-e %s" % shlex.quote(w) for w in sorted(self.words)])
+            if bootstrap:
+                grep = "IFS= read -r first && printf '%%s\\n' \"$first\"; %s" % grep
+            follow = "%s | { %s; }" % (follow, grep)
+        if not bootstrap:
+            # the entries older than now are only those that the
+            # previous filter would have kept
+            follow = "echo \"{\\\"%s\\\": $(date +%%s%%6N)}\"; %s" % (RESUME_MARK, follow)
+        return (self.rsh._cmd([self.node, follow]), bootstrap, previous)
+
+    def run(self):
+        delay = 1
+        while not self.stopped:
+            received = self.follow()
+            if self.stopped:
+                break
+            with self.cond:
+                restarting, self.restarting = self.restarting, False
+            if restarting:
+                continue
+            delay = 1 if received else min(delay * 2, self.max_delay)
+            time.sleep(delay)
+
+    def follow(self):
+        '''Read the stream until it drops, return the number of lines read'''
+        # spawning the control master from the stream would keep
+        # the stream's stdout open after the connection drops
+        proc, rc = self.rsh.ensure_control_master(self.node)
+        if rc != 0:
+            return 0
+        with self.cond:
+            command, skip, previous = self.command()
+            self.restarting = False
+            # a bootstrapped stream sends everything after its first line
+            self.live = skip
+            self.live_words = self.words
+            proc = self.proc = Popen(command, stdout=PIPE, stderr=DEVNULL,
+                                     stdin=DEVNULL, close_fds=True, shell=True,
+                                     start_new_session=True)
+        self.connected.set()
+        received = 0
+        resumed = 0
+        for data in iter(proc.stdout.readline, b""):
+            text = data.decode("utf-8", "replace")
+            try:
+                entry = json.loads(text)
+            except ValueError:
+                continue
+            if RESUME_MARK in entry:
+                resumed = int(entry[RESUME_MARK])
+                with self.cond:
+                    self.live = True
+                    self.cond.notify_all()
+                continue
+            self.cursor = entry.get("__CURSOR", self.cursor)
+            if skip:
+                skip = False
+                continue
+            if resumed:
+                if int(entry.get("__REALTIME_TIMESTAMP", 0)) >= resumed:
+                    resumed = 0
+                elif previous is not None and not any(w in text for w in previous):
+                    continue
+            self.append(format_journal_entry(entry), len(data))
+            received += 1
+        proc.stdout.close()
+        rc = proc.wait()
+        if rc == 255:
+            control_masters.invalidate(self.node)
+        elif rc != 0 and received == 0 and self.cursor and not self.restarting:
+            self.cursor = ""
+        if not self.stopped and not self.restarting:
+            self.logger.debug("journal stream of %s ended with rc %d after %d lines, reconnecting"
+                              % (self.node, rc, received))
+        return received
+
+    def append(self, line, size=0):
+        with self.cond:
+            self.lines.append((self.next_seq, line))
+            self.next_seq += 1
+            self.lines_received += 1
+            self.bytes_received += size
+            self.last_received = time.time()
+            self.cond.notify_all()
+
+    def head(self):
+        '''Sequence number of the next line to be received'''
+        with self.cond:
+            return self.next_seq
+
+    def read(self, offset, limit=None):
+        '''Lines received from sequence number offset up to limit
+        (excluded), and the offset to use for the next read'''
+        with self.cond:
+            end = self.next_seq if limit is None else min(limit, self.next_seq)
+            if end <= offset:
+                return ([], offset)
+            first = self.lines[0][0] if self.lines else self.next_seq
+            if offset < first:
+                self.logger.debug("journal stream of %s: %d lines overwritten before being read"
+                                  % (self.node, first - offset))
+                offset = first
+            lines = [line for _, line in
+                     itertools.islice(self.lines, offset - first, end - first)]
+            return (lines, end)
+
+    def settle(self, idle=0.25, timeout=1.0):
+        '''Wait until no line was received for idle seconds, to let
+        in-flight log lines reach the buffer. Return the head.'''
+        deadline = time.time() + timeout
+        with self.cond:
+            while time.time() < deadline:
+                quiet = time.time() - self.last_received
+                if quiet >= idle:
+                    break
+                self.cond.wait(min(idle - quiet, deadline - time.time()))
+            return self.next_seq
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        if self.proc:
+            self.kill(self.proc)
+
+    def kill(self, proc):
+        # the shell and ssh run in their own process group
+        if proc.poll() is None:
+            try:
+                os.killpg(proc.pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+
+class JournalStreams(object):
+    '''Registry of the journal streams, one per node, started lazily'''
+    def __init__(self):
+        self.enabled = True
+        self.lock = threading.Lock()
+        self.streams = {}
+
+    def get(self, node):
+        with self.lock:
+            stream = self.streams.get(node)
+            if stream is None:
+                stream = JournalStream(node, RemoteFactory().getInstance())
+                self.streams[node] = stream
+        # the first watch on a node must not miss the lines logged
+        # while the stream is connecting
+        stream.connected.wait(10)
+        return stream
+
+    def start(self, nodes):
+        for node in nodes:
+            self.get(node)
+
+    def stop(self):
+        with self.lock:
+            streams = list(self.streams.values())
+            self.streams.clear()
+        for stream in streams:
+            stream.stop()
+
+    def transferred(self, nodes):
+        '''(lines, bytes) received so far from the nodes' streams'''
+        with self.lock:
+            streams = [self.streams[n] for n in nodes if n in self.streams]
+        return (sum([s.lines_received for s in streams]),
+                sum([s.bytes_received for s in streams]))
+
+
+journal_streams = JournalStreams()
+
+
+class StreamObj(SearchObj):
+    '''LogWatcher source reading from a node's journal stream.
+
+    Unlike CTS' JournalObj, harvesting doesn't run any remote
+    command, so a watcher never waits for a node to answer.
+    '''
+    def __init__(self, host=None, name=None, regexes=None):
+        SearchObj.__init__(self, "journal", host, name)
+        self.stream = journal_streams.get(self.host)
+        self.offset = self.stream.head()
+        self.hitLimit = False
+        # regexes still run locally, the node only drops the
+        # lines that can't possibly match
+        token = self.stream.add_filter(pushdown_words(regexes or [""]))
+        weakref.finalize(self, self.stream.remove_filter, token)
+
+    def harvest(self, delegate=None):
+        self.harvest_async(delegate)
+
+    def harvest_async(self, delegate=None):
+        if self.limit is not None and self.hitLimit:
+            return None
+        lines, self.offset = self.stream.read(self.offset, self.limit)
+        if self.limit is not None and self.offset >= self.limit:
+            self.hitLimit = True
+        if delegate:
+            delegate.async_complete(0, 0, lines, [])
+        return None
+
+    def setend(self):
+        if self.limit is not None:
+            return
+        self.hitLimit = False
+        self.limit = self.stream.settle()
+        self.debug("Set limit to: %d" % self.limit)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+'''Resource Agent Tester
+
+Matching log lines against many patterns at once
+ '''
+
+__copyright__ = '''
+Copyright (C) 2020 Damien Ciabrini <dciabrin@redhat.com>
+Licensed under the GNU GPL.
+'''
+
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
+
+
+import functools
+import re
+
+from racts.raevents import OpExpect, parse_op_result
+
+try:
+    import re._parser as sre_parse
+except ImportError:
+    import sre_parse
+
+
+# words can't span two fields of a formatted journal entry, and
+# they're never escaped in journalctl's JSON output
+WORD_CHARS = re.compile(r"[A-Za-z0-9_.-]+")
+
+
+def required_words(pattern):
+    '''Set of words of which at least one appears in every line matched
+    by the regex pattern, or None if no such set could be found'''
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return None
+    if parsed.state.flags & re.IGNORECASE:
+        return None
+    return required_words_of(parsed)
+
+
+def required_words_of(sequence):
+    candidates = []
+    run = []
+    for op, arg in list(sequence) + [(None, None)]:
+        if op == sre_parse.LITERAL:
+            run.append(chr(arg))
+            continue
+        candidates += [{w} for w in WORD_CHARS.findall("".join(run))]
+        run = []
+        if op == sre_parse.SUBPATTERN:
+            # (?i:...) words may appear in any case
+            if not arg[1] & re.IGNORECASE:
+                candidates.append(required_words_of(arg[-1]))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and arg[0] > 0:
+            candidates.append(required_words_of(arg[2]))
+        elif op == sre_parse.BRANCH:
+            branches = [required_words_of(b) for b in arg[1]]
+            if all(branches):
+                candidates.append(set().union(*branches))
+    candidates = [c for c in candidates if c]
+    if not candidates:
+        return None
+    # the most selective candidate: long words, few alternatives
+    return max(candidates, key=lambda c: (min(len(w) for w in c), -len(c)))
+
+
+class PatternSet(object):
+    '''A list of regexes, compiled once and searched together.
+
+    Most lines match none of the patterns. A line is only searched
+    with the patterns for which it contains a required word, so the
+    common case costs a few substring tests rather than one regex
+    search per pattern. Operation results are parsed once per line and
+    OpExpect patterns are looked up by (resource, operation). Like CTS,
+    the first pattern of the list that matches wins.
+    '''
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.compiled = [re.compile(p) for p in self.patterns]
+        self.always = []
+        self.ops = {}
+        index = {}
+        for i, pattern in enumerate(self.patterns):
+            if isinstance(pattern, OpExpect):
+                self.ops.setdefault(pattern.key(), []).append(i)
+                continue
+            words = required_words(pattern)
+            if words is None:
+                self.always.append(i)
+                continue
+            for w in words:
+                index.setdefault(w, []).append(i)
+        self.index = list(index.items())
+
+    def search(self, line):
+        '''(index, match object) of the first matching pattern,
+        or (-1, None)'''
+        candidates = [i for w, indexes in self.index if w in line for i in indexes]
+        if self.ops:
+            result = parse_op_result(line)
+            if result:
+                for key in ((result.resource, result.op), (None, result.op)):
+                    candidates += [i for i in self.ops.get(key, [])
+                                   if self.patterns[i].matches(result)]
+        if not candidates and not self.always:
+            return (-1, None)
+        for i in sorted(set(candidates).union(self.always)):
+            match = self.compiled[i].search(line)
+            if match:
+                return (i, match)
+        return (-1, None)
+
+    def matches(self, line):
+        return self.search(line)[1] is not None
+
+
+@functools.lru_cache(maxsize=256)
+def cached_pattern_set(patterns, expects):
+    return PatternSet(patterns)
+
+
+def pattern_set(patterns):
+    '''The compiled PatternSet of a list of regexes'''
+    # an OpExpect is equal to its regex, keep them apart in the cache
+    return cached_pattern_set(tuple(patterns),
+                              tuple([isinstance(p, OpExpect) for p in patterns]))
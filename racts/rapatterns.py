@@ -26,10 +26,14 @@ Licensed under the GNU GPL.
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
 
 
+from racts.raevents import OpExpect, expect_ops
+
+
 class RATemplates(object):
     def __init__(self):
         self.fun_patterns = {
-            "Pat:RscRemoteOp": self.pat_rsc_remote_op
+            "Pat:RscRemoteOp": self.pat_rsc_remote_op,
+            "Pat:RscRemoteOps": self.pat_rsc_remote_ops
         }
 
     def build(self, template, *args):
@@ -41,7 +45,7 @@ class RATemplates(object):
             raise KeyError(template)
 
     def pat_rsc_remote_op(self, operation, resource, node, status):
-        return r"(crmd|pacemaker-controld).*:\s*(Result\sof\s%s\soperation\sfor\s%s\son\s%s.*%s|"\
-               r"Operation %s_%s.*:\s*%s \(node=%s,.*,\s*confirmed=true\))" % \
-            (operation, resource, node, status, resource,
-             "monitor" if operation == "probe" else operation, status, node)
+        return OpExpect(operation, resource, node, status)
+
+    def pat_rsc_remote_ops(self, operation, resource, nodes, status):
+        return expect_ops(operation, resource, nodes, status)
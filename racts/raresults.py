@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+'''Resource Agent Tester
+
+Machine-readable results of a run, streamed as JSON lines and rendered as JUnit XML
+ '''
+
+__copyright__ = '''
+Copyright (C) 2020 Damien Ciabrini <dciabrin@redhat.com>
+Licensed under the GNU GPL.
+'''
+
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
+
+
+import json
+import os
+import threading
+import xml.etree.ElementTree as ET
+
+
+PHASES = ("setup", "test", "teardown")
+
+
+def test_result(module, scenario, test, cluster, status, begin, end, rsh_calls, log_bytes):
+    '''Record of a test run, as saved in results.jsonl'''
+    timings = getattr(test, "timings", {})
+    result = {"module": module,
+              "scenario": scenario,
+              "test": test.name,
+              "iteration": getattr(test, "iteration", 1),
+              "cluster": list(cluster),
+              "status": status,
+              "failure": getattr(test, "failure_reason", None),
+              "start": round(begin, 3),
+              "duration": round(end - begin, 3),
+              "rsh_calls": rsh_calls,
+              "log_bytes": log_bytes,
+              "phases": {p: round(timings[p], 3) for p in PHASES if p in timings}}
+    return result
+
+
+def load_results(path):
+    '''Records saved in a results.jsonl file. A run that crashed
+    may have left an incomplete last line, it is ignored.'''
+    results = []
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    results.append(json.loads(line))
+                except ValueError:
+                    pass
+    except (IOError, OSError):
+        pass
+    return results
+
+
+def junit_counts(results):
+    return {"tests": str(len(results)),
+            "failures": str(len([r for r in results if r["status"] == "failed"])),
+            "skipped": str(len([r for r in results if r["status"] == "skipped"])),
+            "time": "%.3f" % sum([r["duration"] for r in results])}
+
+
+def render_junit(results):
+    '''JUnit XML tree of the results, one test suite per scenario'''
+    suites = {}
+    for r in results:
+        suites.setdefault("%s:%s" % (r["module"], r["scenario"]), []).append(r)
+    root = ET.Element("testsuites", name="ra-tester", **junit_counts(results))
+    for name, cases in suites.items():
+        suite = ET.SubElement(root, "testsuite", name=name, **junit_counts(cases))
+        for r in cases:
+            testname = r["test"] if r["iteration"] == 1 else "%s[%d]" % (r["test"], r["iteration"])
+            case = ET.SubElement(suite, "testcase", name=testname,
+                                 classname="%s.%s" % (r["module"], r["scenario"]),
+                                 time="%.3f" % r["duration"])
+            properties = ET.SubElement(case, "properties")
+            ET.SubElement(properties, "property", name="cluster", value=" ".join(r["cluster"]))
+            for key in ("rsh_calls", "log_bytes"):
+                ET.SubElement(properties, "property", name=key, value=str(r[key]))
+            for phase, duration in sorted(r["phases"].items()):
+                ET.SubElement(properties, "property", name="%s_time" % phase, value="%.3f" % duration)
+            if r["status"] == "failed":
+                ET.SubElement(case, "failure", message=r["failure"] or "test failed")
+            elif r["status"] == "skipped":
+                ET.SubElement(case, "skipped")
+    return ET.ElementTree(root)
+
+
+class ResultsStore(object):
+    '''Results of the tests of a run.
+
+    Every result is appended to results.jsonl in the run directory
+    as soon as its test completes, so the results of a run survive
+    a crash of ra-tester. The JUnit report is rendered from that
+    file at the end of the run.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.directory = None
+        self.file = None
+
+    @property
+    def enabled(self):
+        return self.file is not None
+
+    def open(self, directory):
+        self.directory = directory
+        self.file = open(os.path.join(directory, "results.jsonl"), "a")
+
+    def record(self, result):
+        if self.file is None:
+            return
+        line = json.dumps(result, sort_keys=True)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        '''Write the JUnit report, return its path'''
+        if self.file is None:
+            return None
+        with self.lock:
+            self.file.close()
+            self.file = None
+        path = os.path.join(self.directory, "junit.xml")
+        results = load_results(os.path.join(self.directory, "results.jsonl"))
+        render_junit(results).write(path, encoding="utf-8", xml_declaration=True)
+        return path
+
+
+results_store = ResultsStore()
@@ -25,21 +25,141 @@ Licensed under the GNU GPL.
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
 
+import time
+
 from cts.logging import LogFactory
 from cts.remote import RemoteFactory
 from cts.CTSscenarios import Sequence
 
+from racts.raagent import AgentRemoteExec
+from racts.racheckpoint import checkpoint, scenario_fingerprint
+from racts.racib import CIBSnapshots
+from racts.rahistory import test_history, platform
+from racts.rajournal import journal_streams
+from racts.raresults import results_store, test_result
+from racts.ratrace import tracer
+
 
 class RARunner(Sequence):
-    def __init__(self, ClusterManager, Components, Audits, Tests):
+    def __init__(self, ClusterManager, Components, Audits, Tests, module=None, scenario=None):
         Sequence.__init__(self, ClusterManager, Components, Audits, Tests)
+        self.module = module
+        self.scenario = scenario
         self.rsh = RemoteFactory().getInstance()
         self.logger = LogFactory()
         self.Env = ClusterManager.Env
 
     def SetUp(self):
+        if isinstance(self.rsh, AgentRemoteExec):
+            self.logger.log("Start remote agents on all cluster nodes")
+            self.rsh.start_agents(self.Env["nodes"])
         self.logger.log("Prepare log directories on all cluster nodes")
         for node in self.Env["nodes"]:
             self.rsh(node, "mkdir -p /var/log/pacemaker")
 
-        return Sequence.SetUp(self)
+        self.Env["cib_snapshots"] = None
+        # when resuming a run, the scenario components don't set up
+        # the cluster again if it was left as the scenario expects
+        baseline = self.resumable_setup()
+        self.Env["resumed_setup"] = baseline is not None
+        try:
+            if not Sequence.SetUp(self):
+                return 0
+        finally:
+            self.Env["resumed_setup"] = False
+        cluster_manager = self.Env["distribution"].cluster_manager()
+        if baseline is not None:
+            # remove what the interrupted test left
+            try:
+                cluster_manager.cib_replace_configuration(self.Env["nodes"][0], baseline)
+                cluster_manager.wait_for_idle(self.Env["nodes"][0], self.Env["DeadTime"],
+                                              online=self.Env["nodes"])
+            except AssertionError as e:
+                self.logger.log("Could not restore the scenario's CIB: %s" % e)
+                return 0
+        # tests restore a CIB snapshot rather than deleting their resources
+        if not self.Env.has_key("skip_cib_restore"):
+            try:
+                snapshots = CIBSnapshots(cluster_manager, self.Env["nodes"], self.Env["DeadTime"])
+                snapshots.capture_baseline()
+                self.Env["cib_snapshots"] = snapshots
+            except AssertionError as e:
+                self.logger.log("Could not capture baseline CIB, tests will delete their resources: %s" % e)
+        if checkpoint.enabled:
+            try:
+                snapshots = self.Env["cib_snapshots"]
+                baseline = snapshots.baseline if snapshots else \
+                    cluster_manager.cib_query(self.Env["nodes"][0], "configuration")
+                checkpoint.scenario_set_up(self.module, self.scenario, self.Env["nodes"],
+                                           self.fingerprint(baseline), baseline)
+            except AssertionError as e:
+                self.logger.log("Could not checkpoint the scenario setup: %s" % e)
+        return 1
+
+    def fingerprint(self, configuration):
+        return scenario_fingerprint(self.module, self.scenario, self.Components,
+                                    self.Env["nodes"], configuration)
+
+    def resumable_setup(self):
+        '''Baseline CIB of the scenario, if it is still set up on the
+        cluster by the interrupted run being resumed'''
+        saved = checkpoint.scenario(self.module, self.scenario, self.Env["nodes"])
+        if saved is None:
+            return None
+        fingerprint, baseline = saved
+        try:
+            configuration = self.Env["distribution"].cluster_manager().cib_query(
+                self.Env["nodes"][0], "configuration")
+        except AssertionError:
+            configuration = None
+        if configuration is None or self.fingerprint(configuration) != fingerprint:
+            self.logger.log("Cluster %s changed since the interrupted run, setting up scenario %s again" %
+                            (self.Env["nodes"], self.scenario))
+            return None
+        self.logger.log("Resuming scenario %s on cluster %s, skipping its setup" %
+                        (self.scenario, self.Env["nodes"]))
+        return baseline
+
+    def run_test(self, test, testcount):
+        nodes = self.Env["nodes"]
+        before = journal_streams.transferred(nodes)
+        calls = tracer.remote_calls(nodes)
+        scanned = tracer.scanned()
+        failures = self.Stats.get("failure", 0)
+        skipped = test.Stats.get("skipped", 0)
+        begin = time.time()
+        # commands run on the cluster's nodes are attributed to the test
+        tracer.set_context(nodes, test.name)
+        try:
+            with tracer.span(test.name, "run_test", nodes[0]):
+                ret = Sequence.run_test(self, test, testcount)
+        finally:
+            tracer.set_context(nodes, None)
+        end = time.time()
+        lines, size = journal_streams.transferred(nodes)
+        if journal_streams.enabled:
+            self.logger.log("Journal lines received during %s: %d lines, %d bytes" %
+                            (test.name, lines - before[0], size - before[1]))
+        if self.Stats.get("failure", 0) > failures:
+            status = "failed"
+        elif test.Stats.get("skipped", 0) > skipped:
+            status = "skipped"
+        else:
+            status = "passed"
+        result = test_result(self.module, self.scenario, test, nodes, status, begin, end,
+                             tracer.remote_calls(nodes) - calls, tracer.scanned() - scanned)
+        results_store.record(result)
+        test_history.record(result, *platform(nodes[0]))
+        checkpoint.test_completed(self.module, self.scenario, test.name,
+                                  getattr(test, "iteration", 1), status)
+        return ret
+
+    def TearDown(self, max=None):
+        snapshots = self.Env["cib_snapshots"]
+        if max is None and snapshots and snapshots.current is not None:
+            try:
+                snapshots.restore_baseline()
+            except AssertionError as e:
+                self.logger.log("Could not restore baseline CIB: %s" % e)
+        checkpoint.scenario_torn_down(self.module, self.scenario, self.Env["nodes"])
+        return Sequence.TearDown(self, max)
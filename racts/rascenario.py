@@ -26,22 +26,28 @@ Licensed under the GNU GPL.
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
 
 
-import time
+import hashlib
+import io
 import os
-import re
-import tempfile
+import shlex
+import stat
+import tarfile
+import time
 from cts.CTSscenarios import ScenarioComponent
 from cts.logging import LogFactory
 from cts.remote import RemoteFactory
-from cts.watcher import LogWatcher
 # from racts.cluster    import get_cluster_manager
 # from racts.package    import get_package_manager
 # from racts.container  import get_container_engine
 # from racts.distrib    import get_distribution
+from racts.package.cache import package_cache
+from racts.raaction import ActionMixin
+from racts.rafacts import node_facts
 from racts.rapatterns import RATemplates
+from racts.ratrace import tracer
 
 
-class RATesterScenarioComponent(ScenarioComponent):
+class RATesterScenarioComponent(ScenarioComponent, ActionMixin):
     '''Assertion-friendly base class for scenario setup/teardown.
     '''
     def __init__(self, environment, scenario_module_name=""):
@@ -58,77 +64,106 @@ class RATesterScenarioComponent(ScenarioComponent):
         self.dependencies = []
 
     def node_fqdn(self, node):
-        return self.rsh(node, "getent ahosts %s | awk '/STREAM/ {print $3;exit}'" % node, stdout=1).strip()
+        return node_facts.get(node, "fqdn")
 
     def node_fqdn_ipv6(self, node):
-        return self.rsh(node, "getent ahosts %s.v6 | awk '/STREAM/ {print $3;exit}'" % node, stdout=1).strip()
+        return node_facts.get(node, "fqdn_ipv6")
 
     def node_shortname(self, node):
-        return self.rsh(node, "hostname", stdout=1).strip()
+        return node_facts.get(node, "hostname")
 
     def node_ip(self, node):
-        return self.rsh(node, "getent ahosts %s | awk '/STREAM/ {print $1;exit}'" % node, stdout=1).strip()
+        return node_facts.get(node, "ip")
 
     def node_ipv6(self, node):
-        return self.rsh(node, "getent ahosts %s.v6 | awk '/STREAM/ {print $1;exit}'" % node, stdout=1).strip()
+        return node_facts.get(node, "ipv6")
+
+    def render_files(self, files, owner=False, perm=False, template=False, node=None):
+        '''Content of the files to push, with templates rendered in memory.
+        Return a list of (remotefile, data, owner, mode)'''
+        rendered = []
+        for localfile, remotefile in files:
+            src = os.path.join(os.path.dirname(os.path.abspath(__file__)), localfile)
+            if template:
+                with open(src, "r") as f:
+                    text = f.read()
+                if isinstance(template, dict):
+                    for k, v in template.items():
+                        text = text.replace(k, v)
+                else:
+                    text = text.replace("{{node}}", self.node_fqdn(node))
+                data = text.encode()
+            else:
+                with open(src, "rb") as f:
+                    data = f.read()
+            mode = int(perm, 8) if perm else stat.S_IMODE(os.stat(src).st_mode)
+            rendered.append((remotefile, data, owner, mode))
+        return rendered
+
+    def push_files(self, node, rendered, create_dir=False):
+        '''Copy rendered files on a node with a single tar stream,
+        skipping the files whose content, owner and mode already match.
+        Return a {remotefile: "changed"|"unchanged"} report'''
+        paths = " ".join([shlex.quote(f[0]) for f in rendered])
+        dirs = " ".join(sorted(set([shlex.quote(os.path.dirname(f[0])) for f in rendered])))
+        rc, lines = self.rsh(node, "for d in %s; do test -d \"$d\" || echo \"missing $d\"; done; "
+                             "for f in %s; do if [ -f \"$f\" ]; then "
+                             "echo \"$(sha256sum \"$f\" | cut -d' ' -f1) "
+                             "$(stat -c '%%U %%u %%G %%g %%a' \"$f\") $f\"; fi; done" % (dirs, paths),
+                             stdout=None)
+        assert rc == 0, "check existing files on remote node \"%s\"" % node
+        existing = {}
+        for line in lines:
+            if line.startswith("missing "):
+                assert create_dir, "directory \"%s\" missing on remote node \"%s\"" % \
+                    (line[8:].strip(), node)
+                continue
+            digest, user, uid, group, gid, mode, path = line.rstrip("\n").split(" ", 6)
+            existing[path] = (digest, (user, uid), (group, gid), int(mode, 8))
+
+        report = {}
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode="w") as tar:
+            for remotefile, data, owner, mode in rendered:
+                user, _, group = (owner or "root").partition(":")
+                current = existing.get(remotefile)
+                if current and current[0] == hashlib.sha256(data).hexdigest() and \
+                   current[3] == mode and user in current[1] and \
+                   (not group or group in current[2]):
+                    report[remotefile] = "unchanged"
+                    continue
+                report[remotefile] = "changed"
+                info = tarfile.TarInfo(remotefile.lstrip("/"))
+                info.size = len(data)
+                info.mode = mode
+                info.mtime = time.time()
+                for name, attr in ((user, "uname"), (group, "gname")):
+                    if name.isdigit():
+                        setattr(info, attr[0] + "id", int(name))
+                    elif name:
+                        setattr(info, attr, name)
+                tar.addfile(info, io.BytesIO(data))
+
+        if "changed" in report.values():
+            rc, out, err = self.rsh.call_with_input(node, "tar -x -p -f - -C /", archive.getvalue())
+            assert rc == 0, "copy %s on remote node \"%s\": %s" % \
+                ([f for f in report if report[f] == "changed"], node, "".join(err).strip())
+        if self.verbose:
+            for remotefile in sorted(report):
+                self.log("> [%s] %s: %s" % (node, remotefile, report[remotefile]))
+        return report
 
     def copy_to_nodes(self, files, create_dir=False, owner=False, perm=False, template=False, nodes=False):
-        if nodes == False:
+        if nodes is False:
             nodes = self.Env["nodes"]
-        for node in self.Env["nodes"]:
-            for localfile, remotefile in files:
-                if create_dir:
-                    remotedir = os.path.dirname(remotefile)
-                    rc = self.rsh(node, "mkdir -p %s" % remotedir)
-                    assert rc == 0, "create dir \"%s\" on remote node \"%s\"" % (remotedir, node)
-                src = os.path.join(os.path.dirname(os.path.abspath(__file__)), localfile)
-                with tempfile.NamedTemporaryFile() as tmp:
-                    if template:
-                        with open(src, "r") as f:
-                            template = f.read()
-                        tmp.write(template.replace("{{node}}", self.node_fqdn(node)))
-                        tmp.flush()
-                        cpsrc = tmp.name
-                    else:
-                        cpsrc = src
-                    rc = self.rsh.cp(cpsrc, "root@%s:%s" % (node, remotefile))
-                    assert rc == 0, "copy test data \"%s\" on remote node \"%s\"" % (src, node)
-                    if owner:
-                        rc = self.rsh(node, "chown %s %s" % (owner, remotefile))
-                        assert rc == 0, "change ownership of \"%s\" on remote node \"%s\"" % (src, node)
-                    if perm:
-                        rc = self.rsh(node, "chmod %s %s" % (perm, remotefile))
-                        assert rc == 0, "change permission of \"%s\" on remote node \"%s\"" % (src, node)
+        reports = self.run_on_nodes(lambda node: self.copy_to_node(node, files, create_dir, owner,
+                                                                   perm, template),
+                                    nodes)
+        return dict(zip(nodes, reports))
 
     def copy_to_node(self, node, files, create_dir=False, owner=False, perm=False, template=False):
-        for localfile, remotefile in files:
-            if create_dir:
-                remotedir = os.path.dirname(remotefile)
-                rc = self.rsh(node, "mkdir -p %s" % remotedir)
-                assert rc == 0, "create dir \"%s\" on remote node \"%s\"" % (remotedir, node)
-            src = os.path.join(os.path.dirname(os.path.abspath(__file__)), localfile)
-            with tempfile.NamedTemporaryFile(mode='w') as tmp:
-                if template:
-                    with open(src, "r") as f:
-                        lines = f.readlines()
-                    for line in lines:
-                        tmpstr = line
-                        for k, v in template.items():
-                            if k in tmpstr:
-                                tmpstr = tmpstr.replace(k, v)
-                        tmp.write(tmpstr)
-                    tmp.flush()
-                    cpsrc = tmp.name
-                else:
-                    cpsrc = src
-                rc = self.rsh.cp(cpsrc, "root@%s:%s" % (node, remotefile))
-                assert rc == 0, "copy test data \"%s\" on remote node \"%s\"" % (src, node)
-                if owner:
-                    rc = self.rsh(node, "chown %s %s" % (owner, remotefile))
-                    assert rc == 0, "change ownership of \"%s\" on remote node \"%s\"" % (src, node)
-                if perm:
-                    rc = self.rsh(node, "chmod %s %s" % (perm, remotefile))
-                    assert rc == 0, "change permission of \"%s\" on remote node \"%s\"" % (src, node)
+        rendered = self.render_files(files, owner, perm, template, node)
+        return self.push_files(node, rendered, create_dir)
 
     def get_candidate_path(self, candidates, is_dir=False):
         testopt = "-f" if is_dir is False else "-d"
@@ -141,22 +176,41 @@ class RATesterScenarioComponent(ScenarioComponent):
     def IsApplicable(self):
         return 1
 
+    def resumed(self):
+        '''True if the interrupted run being resumed left the cluster
+        set up. The scenario's config must still be built, only the
+        steps changing the cluster are skipped'''
+        resumed = bool(self.Env["resumed_setup"])
+        if resumed:
+            self.log("Setup of %s already done by the interrupted run" % self.__class__.__name__)
+        return resumed
+
     def SetUp(self, cluster_manager):
         try:
-            self.setup_scenario(cluster_manager)
+            phase = "SetUp %s" % self.__class__.__name__
+            tracer.set_context(self.Env["nodes"], phase)
+            with tracer.span(phase, "scenario"):
+                self.setup_scenario(cluster_manager)
             return 1
         except AssertionError as e:
             print("Setup of scenario %s failed: %s" %
                   (self.__class__.__name__, str(e)))
+        finally:
+            tracer.set_context(self.Env["nodes"], None)
         return 0
 
     def TearDown(self, cluster_manager):
         try:
-            self.teardown_scenario(cluster_manager)
+            phase = "TearDown %s" % self.__class__.__name__
+            tracer.set_context(self.Env["nodes"], phase)
+            with tracer.span(phase, "scenario"):
+                self.teardown_scenario(cluster_manager)
             return 1
         except AssertionError as e:
             print("Teardown of scenario %s failed: %s" %
                   (self.__class__.__name__, str(e)))
+        finally:
+            tracer.set_context(self.Env["nodes"], None)
         return 0
 
     def log(self, args):
@@ -165,30 +219,27 @@ class RATesterScenarioComponent(ScenarioComponent):
     def debug(self, args):
         self.logger.debug(args)
 
-    def rsh_check(self, target, command, expected=0):
-        if self.verbose:
-            self.logger.log("> [%s] %s" % (target, command))
-        temp = "ratester-tmp%f" % time.time()
-        res = self.rsh(target, command + " &>" + temp)
-        if res != expected:
-            if type(res) is list:
-                res = res[0]
-            self.rsh(target, "mv %s '%s-%s-%d'" % (temp, temp, command, res))
-        else:
-            self.rsh(target, "rm -f %s" % temp)
-        assert res == expected, "%s: \"%s\" returned %d" % (self, command, res)
-
     def check_package_dependencies(self, target, pkgs):
         # make sure a container runtime is available
         if bool(self.Env["config"]["bundle"]):
             pkgs = pkgs + [self.container_engine.package_name()]
 
-        for p in pkgs:
-            if not self.package_manager.is_installed(target, p):
-                self.package_manager.install(target, p)
-            else:
-                if self.package_manager.can_be_updated(target, p):
-                    self.package_manager.update(target, p)
+        # skip the check when the package database didn't change
+        # since all those packages were last checked on the node
+        mapping = self.Env["package_mapping"]
+        fingerprint = self.package_manager.fingerprint(target)
+        if not self.Env["refresh_deps"] and \
+           package_cache.is_fresh(target, fingerprint, mapping, pkgs):
+            if self.verbose:
+                self.log("[%s] packages already checked: %s" % (target, pkgs))
+            return
+        state = self.package_manager.ensure(target, pkgs)
+        if self.verbose:
+            self.log("[%s] packages: %s" % (target, state))
+        if any([s != "current" for s in state.values()]):
+            # the transaction changed the package database
+            fingerprint = self.package_manager.fingerprint(target)
+        package_cache.record(target, fingerprint, mapping, pkgs)
 
     def setup_scenario(self, cluster_manager):
         # In CTS, only tests classes come with a list of logs to be ignored
@@ -199,22 +250,26 @@ class RATesterScenarioComponent(ScenarioComponent):
                        self.container_engine.errorstoignore()
         cluster_manager._ClusterManager__instance_errorstoignore.extend(ignored_logs)
 
+        if self.resumed():
+            return
+
         # install package pre-requisites
         if not self.Env.has_key("skip_install_dependencies"):
             if self.verbose:
                 self.log("[Installing/Updating dependencies]")
-            for node in self.Env["nodes"]:
-                self.check_package_dependencies(node, self.dependencies)
+            self.run_on_nodes(lambda node: self.check_package_dependencies(node, self.dependencies),
+                              self.Env["nodes"])
 
         # container setup
         if bool(self.Env["config"]["bundle"]):
             registry = self.Env["container_insecure_registry"]
             if registry and not self.Env.has_key("skip_container_configure_registry"):
-                for node in self.Env["nodes"]:
+                def configure_registry(node):
                     if self.verbose:
                         self.log("[Configuring insecure registry %s on %s]" %
                                  (registry, node))
                     self.distribution.add_insecure_container_registry(node, registry)
+                self.run_on_nodes(configure_registry, self.Env["nodes"])
             self.container_engine.enable_engine(self.Env["nodes"])
             if not self.Env.has_key("skip_container_image_pull"):
                 self.container_engine.pull_image(self.Env["nodes"],
@@ -235,11 +290,12 @@ class RATesterScenarioComponent(ScenarioComponent):
 
     def setup_new_cluster(self, cluster_manager):
         # stop cluster if previously running, failure is not fatal
-        for node in self.Env["nodes"]:
+        def destroy_cluster(node):
             self.logger.log("destroy any existing cluster on node %s" % node)
             self.rsh(node, "pcs cluster destroy")
             self.rsh(node, "systemctl stop pacemaker_remote")
             self.rsh(node, "systemctl disable pacemaker_remote")
+        self.run_on_nodes(destroy_cluster, self.Env["nodes"])
 
         # recreate any config or state that is required for the resource
         for cluster in self.Env["clusters"]:
@@ -251,20 +307,14 @@ class RATesterScenarioComponent(ScenarioComponent):
         for cluster in self.Env["clusters"]:
             self.log("Creating cluster for nodes %s" % cluster)
             node = cluster[0]
-            patterns = [r"(crmd|pacemaker-controld).*:\s*notice:\sState\stransition\sS_STARTING(\s->.*origin=do_started)?",
-                        r"(crmd|pacemaker-controld).*:\s*notice:\sState\stransition\s.*->\sS_IDLE(\s.*origin=notify_crmd)?"]
-            watch = LogWatcher(self.Env["LogFileName"], patterns, None, self.Env["DeadTime"], kind=self.Env["LogWatcher"], hosts=cluster)
-            watch.setwatch()
             self.cluster_manager.authenticate_nodes(cluster)
             self.cluster_manager.create_cluster(cluster)
-            for n in cluster:
-                self.rsh_check(n, "systemctl enable pacemaker")
+            self.run_on_nodes(lambda n: self.rsh_check(n, "systemctl enable pacemaker"), cluster)
             self.rsh_check(node, "pcs cluster start --all")
             # Disable STONITH by default. A dedicated ScenarioComponent
             # is in charge of enabling it if requested
             self.rsh_check(node, "pcs property set stonith-enabled=false")
-            watch.lookforall()
-            assert not watch.unmatched, watch.unmatched
+            self.cluster_manager.wait_for_idle(node, self.Env["DeadTime"], online=cluster)
 
     def setup_keep_cluster(self, cluster_manager):
         for cluster in self.Env["clusters"]:
@@ -288,28 +338,13 @@ class RATesterScenarioComponent(ScenarioComponent):
             rc = self.rsh(target, "pcs resource unmanage %s" % res_name)
             if rc == 0:
                 cluster_manager.log("Previous resource exists, delete it")
-                # no longer true with pacemaker 1.1.18 and resource refresh
-                # patterns = [r"(crmd|pacemaker-controld).*:\s*Initiating action.*: probe_complete probe_complete-%s on %s"%(n,n) \
-                #         for n in self.Env["nodes"]]
-                resource_pattern = re.sub(r'-(master|clone|bundle)', '', res_name)
-                if self.Env["config"]["bundle"]:
-                    resource_pattern += '-bundle-%s-[0-9]' % self.container_engine.package_name()
-
-                patterns = [self.ratemplates.build("Pat:RscRemoteOp", "probe", resource_pattern, n, '.*')
-                            for n in cluster]
-                watch = LogWatcher(self.Env["LogFileName"], patterns, None, self.Env["DeadTime"], kind=self.Env["LogWatcher"], hosts=cluster)
-                watch.setwatch()
                 self.rsh_check(target, "pcs resource refresh %s" % res_name)
-                watch.lookforall()
-                assert not watch.unmatched, watch.unmatched
+                # the cluster is idle once all the probes completed
+                self.cluster_manager.wait_for_idle(target, self.Env["DeadTime"])
                 self.rsh_check(target, "pcs resource disable %s" % res_name)
                 self.rsh_check(target, "pcs resource manage %s" % res_name)
-
-                patterns = ['Initiating delete operation %s.*on%s' % (res_name, n) for n in cluster]
-                watch = LogWatcher(self.Env["LogFileName"], patterns, None, self.Env["DeadTime"], kind=self.Env["LogWatcher"], hosts=cluster)
-                watch.setwatch()
                 self.rsh_check(target, "pcs resource delete %s" % res_name)
-                watch.lookforall()
+                self.cluster_manager.wait_for_idle(target, self.Env["DeadTime"])
 
     def teardown_scenario(self, cluster_manager):
         cluster_manager.log("Leaving cluster running on all nodes")
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+
+'''Resource Agent Tester
+
+Scheduler class shards the selected tests across independent clusters
+ '''
+
+__copyright__ = '''
+Copyright (C) 2020 Damien Ciabrini <dciabrin@redhat.com>
+Licensed under the GNU GPL.
+'''
+
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
+
+
+import copy
+import inspect
+import threading
+from queue import Queue, Empty
+
+from cts.CTS import NodeStatus
+from cts.CTSaudits import LogAudit
+from cts.CM_corosync import crm_corosync
+from cts.logging import LogFactory
+
+from racts.raaudit import RATesterAuditList
+from racts.racheckpoint import checkpoint
+from racts.rafencing import RATesterDefaultFencing
+from racts.rahistory import test_history, platform, format_duration
+from racts.rarunner import RARunner
+
+
+def shard_environment(lab, cluster):
+    '''Copy of a CtsLab whose environment only targets a single cluster'''
+    env = copy.copy(lab.Env)
+    env.data = dict(lab.Env.data)
+    env["nodes"] = list(cluster)
+    env["clusters"] = [list(cluster)]
+    shard = copy.copy(lab)
+    shard.Env = env
+    return shard
+
+
+def shard_cluster_manager(lab):
+    '''CTS cluster manager bound to the environment of a shard'''
+    cm = crm_corosync(lab)
+    cm.Env = lab.Env
+    cm.ns = NodeStatus(lab.Env)
+    return cm
+
+
+class RAScheduler(object):
+    '''Run the selected module:scenario:test set concurrently on
+    every cluster passed to --nodes, one runner per cluster.
+
+    The selection is split into units of work (a subset of the tests
+    of a scenario). Each cluster pulls units from a shared queue, so
+    the run completes as soon as the slowest cluster is done.
+    '''
+    def __init__(self, lab, selected, verbose=False):
+        self.Env = lab
+        self.selected = selected
+        self.verbose = verbose
+        self.clusters = lab["clusters"]
+        self.logger = LogFactory()
+        self.lock = threading.Lock()
+        self.units = Queue()
+        self.completed = []
+        self.active = {}
+        self.order = lab["test_order"] or "definition"
+        self.platform = platform(self.clusters[0][0])
+
+    def shard(self):
+        '''Split the selection into (module, scenario, [(test, iteration)]) units.
+        When there are fewer scenarios than clusters, the tests of
+        a scenario are spread across several units.'''
+        scenarios = [(m, s) for m in self.selected for s in self.selected[m]]
+        chunks = max(1, len(self.clusters) // max(1, len(scenarios)))
+        num_iter = self.Env["iterations"] or 1
+        units = []
+        for m, s in scenarios:
+            ordered = test_history.order(m, s, self.selected[m][s]["tests"], self.order, *self.platform)
+            # a resumed run skips the tests completed before the interruption
+            tests = [(t, i + 1) for i in range(num_iter) for t in ordered
+                     if not checkpoint.is_completed(m, s, t.name, i + 1)]
+            if not tests:
+                continue
+            n = max(1, min(chunks, len(tests)))
+            size, extra = divmod(len(tests), n)
+            start = 0
+            for i in range(n):
+                end = start + size + (1 if i < extra else 0)
+                units.append((m, s, tests[start:end]))
+                start = end
+        return units
+
+    def run(self):
+        for unit in self.shard():
+            self.units.put(unit)
+        if len(self.clusters) == 1:
+            self.run_cluster(self.clusters[0])
+        else:
+            self.logger.log("Scheduling tests on %d clusters: %s" %
+                            (len(self.clusters), self.clusters))
+            workers = []
+            for cluster in self.clusters:
+                t = threading.Thread(target=self.run_cluster, args=(cluster,),
+                                     name="cluster-%s" % cluster[0])
+                t.daemon = True
+                t.start()
+                workers.append(t)
+            for t in workers:
+                t.join()
+        return self.summarize()
+
+    def run_cluster(self, cluster):
+        while True:
+            try:
+                unit = self.units.get_nowait()
+            except Empty:
+                return
+            self.run_unit(cluster, *unit)
+
+    def run_unit(self, cluster, m, s, tests):
+        desc = self.selected[m][s]
+        lab = shard_environment(self.Env, cluster)
+        env = lab.Env
+        cluster_manager = shard_cluster_manager(lab)
+        audits = RATesterAuditList(cluster_manager)
+        for i in [x for x in audits if isinstance(x, LogAudit)]:
+            i.kinds = ["journal", "remote"]
+
+        components = [c.__class__(env) for c in desc["components"]]
+        if env["stonith"]:
+            if desc["fencing"] is not None:
+                components.append(desc["fencing"].__class__(env))
+            else:
+                components.append(RATesterDefaultFencing(env))
+        bound_tests = []
+        for t, iteration in tests:
+            bound = t.__class__(cluster_manager)
+            bound.Audits = audits
+            bound.iteration = iteration
+            bound_tests.append(bound)
+        if self.verbose:
+            for x in components + bound_tests:
+                x.verbose = True
+
+        self.logger.log(">>>>>>>>>>>>>>>> Starting scenario %s:%s (%d tests) on cluster %s" %
+                        (m, s, len(bound_tests), cluster))
+        self.logger.log("Documentation:          %s" % inspect.getdoc(components[0]))
+        eta, known = test_history.eta(m, s, bound_tests, *self.platform)
+        self.logger.log("Estimated duration:     %s (%d/%d tests with history)" %
+                        (format_duration(eta), known, len(bound_tests)))
+        self.logger.log("CTS Master:             %s" % env["cts-master"])
+        self.logger.log("CTS Logfile:            %s" % env["OutputFile"])
+        self.logger.log("Random Seed:            %s" % env["RandSeed"])
+        self.logger.log("Syslog variant:         %s" % env["syslogd"].strip())
+        self.logger.log("System log files:       %s" % env["LogFileName"])
+        if self.verbose:
+            self.logger.log("verbose mode will log cluster actions")
+
+        runner = RARunner(cluster_manager, components, audits, bound_tests, m, s)
+        with self.lock:
+            self.active[tuple(cluster)] = runner
+        lab.dump()
+        try:
+            lab.run(runner, len(bound_tests))
+        finally:
+            with self.lock:
+                del self.active[tuple(cluster)]
+                self.completed.append((m, s, cluster, runner))
+
+    def runners(self):
+        with self.lock:
+            return [r for _, _, _, r in self.completed] + list(self.active.values())
+
+    def TearDown(self):
+        '''Tear down the scenarios still running (e.g. on SIGTERM)'''
+        with self.lock:
+            active = list(self.active.values())
+        for runner in active:
+            runner.TearDown()
+
+    def summarize(self):
+        '''Merge the results of all the shards into a single summary'''
+        stats = {}
+        per_test = {}
+        with self.lock:
+            completed = list(self.completed)
+            completed += [(None, None, c, r) for c, r in self.active.items()]
+        for m, s, cluster, runner in completed:
+            for k, v in runner.Stats.items():
+                stats[k] = stats.get(k, 0) + v
+            for test in set(runner.Tests):
+                key = "%s:%s:%s" % (m, s, test.name) if m else test.name
+                merged = per_test.setdefault(key, {})
+                for k, v in test.Stats.items():
+                    if isinstance(v, int):
+                        merged[k] = merged.get(k, 0) + v
+        self.logger.log("****************")
+        self.logger.log("Merged results from %d cluster(s): %s" % (len(self.clusters), repr(stats)))
+        self.logger.log("****************")
+        for key in sorted(per_test.keys()):
+            self.logger.log(("Test %s: " % key).ljust(50) + " %s" % repr(per_test[key]))
+        return stats.get("failure", 0)
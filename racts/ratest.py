@@ -26,18 +26,30 @@ Licensed under the GNU GPL.
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
 
 
+import time
+
 from cts.CTStests import CTSTest
 
 from racts.rapatterns import RATemplates
 from racts.raaction import ActionMixin
+from racts.rafacts import node_facts
+from racts.ratrace import tracer
 
 
 class ResourceAgentTest(CTSTest, ActionMixin):
     '''Assertion-friendly base class for resource agent tests'''
+    # tests are listed by name without being instantiated
+    name = "GenericRATest"
+    # facts that must hold on the first node for the test to be
+    # applicable, they're gathered once for all tests
+    applicability = []
+
     def __init__(self, cm):
         CTSTest.__init__(self, cm)
+        # the cluster manager's env only targets the cluster
+        # this test has been scheduled on
+        self.Env = cm.Env
         # self.start_cluster = False
-        self.name = "GenericRATest"
         self.bg = {}
         self.verbose = self.Env["verbose"]
         self.distribution = self.Env["distribution"]
@@ -45,25 +57,38 @@ class ResourceAgentTest(CTSTest, ActionMixin):
         self.package_manager = self.distribution.package_manager()
         self.container_engine = self.distribution.container_engine()
         self.ratemplates = RATemplates()
+        # duration of each phase and first failed assertion,
+        # for the results of the run
+        self.timings = {}
+        self.failure_reason = None
 
-    def setup(self, node):
-        '''Setup test before execution'''
+    def run_phase(self, phase, function, node):
+        begin = time.time()
         try:
-            self.setup_test(node)
+            with tracer.span(phase, "test", node):
+                function(node)
             return self.success()
         except AssertionError as e:
+            if self.failure_reason is None:
+                self.failure_reason = "%s: %s" % (phase, e)
             return self.failure(str(e))
-        return self.success()
+        finally:
+            self.timings[phase] = time.time() - begin
+
+    def setup(self, node):
+        '''Setup test before execution'''
+        return self.run_phase("setup", self.setup_test, node)
 
     def __call__(self, node):
         '''Execute the test'''
         # called only once for all nodes
         self.incr("calls")
-        try:
-            self.test(node)
-            return self.success()
-        except AssertionError as e:
-            return self.failure(str(e))
+        return self.run_phase("test", self.test, node)
+
+    def is_applicable(self):
+        if not CTSTest.is_applicable(self):
+            return False
+        return node_facts.check(self.Env["nodes"][0], self.applicability)
 
     @property
     def config(self):
@@ -71,11 +96,7 @@ class ResourceAgentTest(CTSTest, ActionMixin):
 
     def teardown(self, node):
         '''Teardown, cleanup resource after the test'''
-        try:
-            self.teardown_test(node)
-            return self.success()
-        except AssertionError as e:
-            return self.failure(str(e))
+        return self.run_phase("teardown", self.teardown_test, node)
 
     def resource_probe_pattern(self, config, node):
         pattern = config["ocf_name"]
@@ -91,22 +112,9 @@ class ResourceAgentTest(CTSTest, ActionMixin):
             target_nodes = cluster
         return target_nodes
 
-    def setup_inactive_resource(self, cluster_nodes, config=None):
-        '''Common resource creation for test setup'''
-        if config is None:
-            config = self.config
-
-        node = cluster_nodes[0]
-
-        patterns = [r"(crmd|pacemaker-controld).*:\s*notice:\sState\stransition\s.*->\sS_IDLE(\s.*origin=notify_crmd)?"]
-        patterns += [self.ratemplates.build("Pat:RscRemoteOp", "probe",
-                                            self.resource_probe_pattern(config, n),
-                                            n, 'not running')
-                     for n in cluster_nodes]
-
-        watch = self.create_watch(patterns, self.Env["DeadTime"])
-        watch.setwatch()
-
+    def inactive_resource_commands(self, cluster_nodes, config):
+        '''pcs commands that create a resource in stopped state'''
+        commands = []
         meta = config["meta"] or ""
 
         # create a bundle that will host the resource
@@ -114,7 +122,7 @@ class ResourceAgentTest(CTSTest, ActionMixin):
             bundle_cmd = self.bundle_command(cluster_nodes, config)
             bundle_cmd += " storage-map id=pcmk1 source-dir=/var/log/pacemaker target-dir=/var/log/pacemaker options=rw"
             bundle_cmd += " --disabled"
-            self.rsh_check(node, bundle_cmd)
+            commands.append(bundle_cmd)
             meta += " bundle %s" % config["name"]
 
         # create the resource, set it disabled if it is not
@@ -124,10 +132,44 @@ class ResourceAgentTest(CTSTest, ActionMixin):
             resource_cmd += " meta %s" % meta
         if not config["bundle"]:
             resource_cmd += " --disabled"
-        self.rsh_check(node, resource_cmd)
+        commands.append(resource_cmd)
+        return commands
+
+    def setup_inactive_resources(self, cluster_nodes, configs, constraints=[]):
+        '''Create several resources in a single CIB update, then
+        their constraints in a second one'''
+        node = cluster_nodes[0]
+
+        # the previous test may have left the very same resources,
+        # reset to their initial stopped state
+        snapshots = self.Env["cib_snapshots"]
+        commands = sum([self.inactive_resource_commands(cluster_nodes, c)
+                        for c in configs], [])
+        key = "\n".join(commands + constraints)
+        if snapshots and snapshots.current == key:
+            return
+        if snapshots and snapshots.current is not None:
+            snapshots.restore_baseline()
 
-        watch.lookforall()
-        assert not watch.unmatched, watch.unmatched
+        with self.cluster_manager.cib_transaction(node) as cib:
+            for command in commands:
+                cib.add(command)
+
+        # the resources are probed on all nodes before the cluster is idle
+        self.cluster_manager.wait_for_idle(node, self.Env["DeadTime"])
+
+        with self.cluster_manager.cib_transaction(node) as cib:
+            for command in constraints:
+                cib.add(command)
+
+        if snapshots:
+            snapshots.record(key, [c["name"] for c in configs])
+
+    def setup_inactive_resource(self, cluster_nodes, config=None):
+        '''Common resource creation for test setup'''
+        if config is None:
+            config = self.config
+        self.setup_inactive_resources(cluster_nodes, [config])
 
     def delete_resource(self, cluster_nodes, config=None):
         if config is None:
@@ -137,6 +179,13 @@ class ResourceAgentTest(CTSTest, ActionMixin):
         if self.Env.has_key("keep_resources"):
             return 1
 
+        # reset the resources to their initial state rather than
+        # deleting them, they're removed at the end of the scenario
+        snapshots = self.Env["cib_snapshots"]
+        if snapshots and snapshots.current is not None:
+            snapshots.restore()
+            return
+
         node = cluster_nodes[0]
 
         # give back control to pacemaker in case the test disabled it
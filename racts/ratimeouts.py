@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+'''Resource Agent Tester
+
+Adaptive log watch timeouts, learned from how long patterns took to match
+ '''
+
+__copyright__ = '''
+Copyright (C) 2020 Damien Ciabrini <dciabrin@redhat.com>
+Licensed under the GNU GPL.
+'''
+
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
+
+
+import math
+import threading
+
+from cts.logging import LogFactory
+
+from racts.raevents import OpExpect
+from racts.rahistory import test_history, platform
+
+
+def pattern_family(pattern, nodes):
+    '''Patterns of the same family should take about the same time to
+    match, e.g. "promote galera ok" on a 3 nodes cluster'''
+    if isinstance(pattern, OpExpect):
+        family = "%s %s %s" % (pattern.operation, pattern.resource, pattern.status)
+    else:
+        family = pattern
+        # the longest first, in case a node name contains another one
+        for node in sorted(nodes, key=len, reverse=True):
+            family = family.replace(node, "<node>")
+    return "%s [%d nodes]" % (family, len(nodes))
+
+
+def percentile(values, p):
+    '''Nearest-rank percentile'''
+    values = sorted(values)
+    return values[max(0, int(math.ceil(p / 100.0 * len(values))) - 1)]
+
+
+class WatchTimeouts(object):
+    '''Timeout of a log watch, from the latencies of its patterns in
+    the previous runs on the same platform.
+
+    The timeout is the given percentile of the past latencies times a
+    safety factor, for the slowest pattern of the watch. It is never
+    above the timeout the test asked for, and the test's timeout is
+    kept until every pattern matched at least min_samples times.
+    A watch that misses its learned timeout keeps waiting up to the
+    test's timeout, so a slower run gets recorded instead of failing.
+    '''
+    def __init__(self):
+        self.enabled = True
+        self.percentile = 95
+        self.factor = 2.0
+        self.floor = 10
+        self.min_samples = 5
+        self.logger = LogFactory()
+        self.lock = threading.Lock()
+        self.platforms = {}
+
+    def configure(self, env):
+        if env.has_key("skip_adaptive_timeouts"):
+            self.enabled = False
+        if env.has_key("watch_timeout_percentile"):
+            self.percentile = float(env["watch_timeout_percentile"])
+        if env.has_key("watch_timeout_factor"):
+            self.factor = float(env["watch_timeout_factor"])
+        if env.has_key("watch_timeout_floor"):
+            self.floor = float(env["watch_timeout_floor"])
+
+    def platform(self, nodes):
+        with self.lock:
+            if nodes[0] not in self.platforms:
+                self.platforms[nodes[0]] = platform(nodes[0])
+            return self.platforms[nodes[0]]
+
+    def timeout(self, patterns, nodes, default):
+        '''Timeout of a watch looking for patterns on nodes'''
+        if not self.enabled or not nodes or not patterns:
+            return default
+        learned = 0
+        for pattern in patterns:
+            latencies = test_history.latencies(pattern_family(pattern, nodes), *self.platform(nodes))
+            if len(latencies) < self.min_samples:
+                return default
+            learned = max(learned, percentile(latencies, self.percentile) * self.factor)
+        timeout = int(math.ceil(min(default, max(self.floor, learned))))
+        if timeout < default:
+            self.logger.debug("Adaptive watch timeout: %ds instead of %ds" % (timeout, default))
+        return timeout
+
+    def record(self, latencies, nodes):
+        '''Save the latencies of the patterns matched by a watch,
+        as a list of (pattern, seconds)'''
+        # still learning when adaptive timeouts are disabled
+        if not nodes or not latencies:
+            return
+        test_history.record_matches([(pattern_family(p, nodes), t) for p, t in latencies],
+                                    *self.platform(nodes))
+
+
+watch_timeouts = WatchTimeouts()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+
+'''Resource Agent Tester
+
+Timing spans of a run, exported as Chrome trace events
+ '''
+
+__copyright__ = '''
+Copyright (C) 2020 Damien Ciabrini <dciabrin@redhat.com>
+Licensed under the GNU GPL.
+'''
+
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA.
+
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+
+PCS_COMMAND = re.compile(r"(^|[\s;&|{(])pcs\s")
+REMOTE_CATEGORIES = ("rsh", "pcs", "async")
+
+
+def command_category(command):
+    return "pcs" if PCS_COMMAND.search(command) else "rsh"
+
+
+class Tracer(object):
+    '''Collect the timing spans of a run.
+
+    Spans are recorded for remote commands, log watches, tests and
+    scenarios. Remote commands are attributed to the test currently
+    running on their node. Nested remote commands (e.g. the ssh call
+    behind an rsh_check) are only recorded once, by the outer span.
+
+    Remote commands and log bytes scanned by the watchers are counted
+    even when tracing is disabled, for the per-test results.
+    '''
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.events = []
+        self.threads = {}
+        self.contexts = {}
+        self.calls = {}
+        self.local = threading.local()
+
+    def set_context(self, nodes, name):
+        '''Attribute the spans of nodes (and the current thread) to name'''
+        with self.lock:
+            for node in nodes:
+                if name is None:
+                    self.contexts.pop(node, None)
+                else:
+                    self.contexts[node] = name
+        self.local.context = name
+
+    def context(self, node=None):
+        with self.lock:
+            if node in self.contexts:
+                return self.contexts[node]
+        return getattr(self.local, "context", None)
+
+    @contextmanager
+    def span(self, name, cat, node=None, **args):
+        remote = cat in REMOTE_CATEGORIES
+        if (not self.enabled and not remote) or (remote and getattr(self.local, "remote", False)):
+            yield
+            return
+        if remote:
+            self.local.remote = True
+        begin = time.time()
+        try:
+            yield
+        finally:
+            if remote:
+                self.local.remote = False
+            self.record(name, cat, begin, time.time(), node, args)
+
+    def remote(self, node, command):
+        '''Span of a remote command'''
+        return self.span(command.strip().split("\n")[0][:60], command_category(command),
+                         node, command=command)
+
+    def record(self, name, cat, begin, end, node=None, args=None, tid=None):
+        if cat in REMOTE_CATEGORIES:
+            with self.lock:
+                self.calls[node] = self.calls.get(node, 0) + 1
+        if not self.enabled:
+            return
+        args = dict(args or {})
+        args["node"] = node
+        args["test"] = self.context(node)
+        thread = threading.current_thread()
+        with self.lock:
+            self.threads[thread.ident] = thread.name
+            self.events.append({"name": name, "cat": cat, "ph": "X",
+                                "ts": int(begin * 1e6), "dur": int((end - begin) * 1e6),
+                                "pid": os.getpid(), "tid": tid or thread.ident,
+                                "args": args})
+
+    def remote_calls(self, nodes):
+        '''Number of remote commands run so far on nodes'''
+        with self.lock:
+            return sum([self.calls.get(n, 0) for n in nodes])
+
+    def add_scanned(self, size):
+        self.local.scanned = self.scanned() + size
+
+    def scanned(self):
+        '''Bytes of logs scanned so far by the watchers of the current thread'''
+        return getattr(self.local, "scanned", 0)
+
+    def save(self, directory, top=10):
+        '''Write trace.json (chrome://tracing, Perfetto) and a text
+        summary of the slowest commands of every test'''
+        with self.lock:
+            events = list(self.events)
+            threads = dict(self.threads)
+        metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                     "args": {"name": name}} for tid, name in threads.items()]
+        with open(os.path.join(directory, "trace.json"), "w") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+        with open(os.path.join(directory, "trace-summary.txt"), "w") as f:
+            f.write(self.summary(events, top))
+
+    def summary(self, events, top=10):
+        tests = []
+        by_test = {}
+        for e in events:
+            test = e["args"].get("test") or "(no test)"
+            if test not in by_test:
+                tests.append(test)
+                by_test[test] = []
+            by_test[test].append(e)
+        out = []
+        for test in tests:
+            spans = by_test[test]
+            totals = {}
+            for e in spans:
+                count, dur = totals.get(e["cat"], (0, 0))
+                totals[e["cat"]] = (count + 1, dur + e["dur"])
+            out.append("== %s" % test)
+            out.append("   " + ", ".join(["%s: %d in %.1fs" % (cat, count, dur / 1e6)
+                                          for cat, (count, dur) in sorted(totals.items())]))
+            commands = sorted([e for e in spans if e["cat"] in ("rsh", "pcs")],
+                              key=lambda e: -e["dur"])[:top]
+            for e in commands:
+                out.append("   %8.2fs  %-12s %s" % (e["dur"] / 1e6, e["args"]["node"],
+                                                    " ".join(e["args"]["command"].split())[:100]))
+            out.append("")
+        return "\n".join(out)
+
+
+tracer = Tracer()
+
+
+class StartupTimes(object):
+    '''Breakdown of the time spent before the first test runs.
+
+    Steps are reported like python -X importtime does for modules:
+    one line per step when it completes, with its own time and its
+    cumulative time, nested steps being indented.
+    '''
+    def __init__(self):
+        self.steps = []
+        self.stack = []
+
+    @contextmanager
+    def measure(self, label):
+        begin = time.time()
+        self.stack.append(0.0)
+        try:
+            yield
+        finally:
+            children = self.stack.pop()
+            self.add(label, begin, children)
+
+    def add(self, label, begin, children=0.0):
+        '''Record a step that started at begin and just completed'''
+        elapsed = time.time() - begin
+        self.steps.append((len(self.stack), label, elapsed - children, elapsed))
+        if self.stack:
+            self.stack[-1] += elapsed
+
+    def report(self):
+        lines = ["startup time: self [us] | cumulative | step"]
+        for depth, label, own, cumulative in self.steps:
+            lines.append("startup time: %9d | %10d | %s%s" % (own * 1e6, cumulative * 1e6,
+                                                              "  " * depth, label))
+        return "\n".join(lines)
+
+
+startup_times = StartupTimes()
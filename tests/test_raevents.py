@@ -0,0 +1,35 @@
+'''Operation results are parsed from the controller logs and timed'''
+
+from racts.raevents import expect_ops, op_latency, op_results, parse_timestamp
+
+LINES = [
+    "Oct 18 08:40:37 node1 pacemaker-controld[1234]:  notice: Result of promote operation "
+    "for galera on node1: 0 (ok) | call=25 key=galera_promote_0 confirmed=true",
+    "Oct 18 08:40:41 node2 crmd[1234]:  notice: Operation galera_promote_0: ok "
+    "(node=node2, call=12, rc=0, cib-update=40, confirmed=true)",
+    "Oct 18 08:40:42 node2 pacemaker-controld[1234]:  notice: State transition S_TRANSITION_ENGINE -> S_IDLE",
+]
+
+
+def test_op_results():
+    results = op_results(LINES)
+    assert [(r.op, r.resource, r.node, r.status, r.rc, r.call_id) for r in results] == \
+        [("promote", "galera", "node1", "ok", 0, 25), ("promote", "galera", "node2", "ok", 0, 12)]
+
+
+def test_expect_ops_on_all_nodes():
+    expects = expect_ops("promote", "galera", ["node1", "node2"], "ok")
+    results = op_results(LINES)
+    assert [e.key() for e in expects] == [("galera", "promote")] * 2
+    assert [[e.matches(r) for r in results] for e in expects] == [[True, False], [False, True]]
+
+
+def test_op_latency_from_log_timestamp():
+    result = op_results(LINES)[0]
+    begin = parse_timestamp(LINES[0]) - 10
+    # the line got read 5s after it was logged
+    assert op_latency(result, begin, begin + 15) == 11
+    # never later than the time the line got read
+    assert op_latency(result, begin, begin + 8) == 8
+    result.timestamp = None
+    assert op_latency(result, begin, begin + 15) == 15
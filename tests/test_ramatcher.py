@@ -0,0 +1,29 @@
+'''The words required by a pattern never drop a line it matches'''
+
+import re
+
+import pytest
+
+from racts.ramatcher import PatternSet, required_words
+
+
+@pytest.mark.parametrize("pattern,words", [
+    (r"error: .*bad", {"error"}),
+    (r"State transition .* -> S_IDLE", {"transition"}),
+    (r"(pacemakerd|controld): ", {"pacemakerd", "controld"}),
+    (r"(?i)error", None),
+    (r"(?i:FOO)bar", {"bar"}),
+    (r"(?i:ERROR)", None),
+])
+def test_required_words(pattern, words):
+    assert required_words(pattern) == words
+
+
+@pytest.mark.parametrize("pattern,line", [
+    (r"(?i:FOO)bar", "foobar"),
+    (r"(?i:ERROR): .*failed", "error: start failed"),
+    (r"(?i)error", "ERROR here"),
+])
+def test_pattern_set_matches_like_re(pattern, line):
+    assert bool(re.search(pattern, line))
+    assert PatternSet([pattern]).matches(line)
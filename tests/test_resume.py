@@ -0,0 +1,47 @@
+'''A resumed run skips the cluster setup of a scenario, but still
+builds the scenario's config'''
+
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("cts")
+
+from ra.dummy.scenarios import SimpleSetup  # noqa: E402
+
+
+class Env(dict):
+    def has_key(self, key):
+        return key in self
+
+
+def make_env(resumed):
+    distribution = mock.MagicMock()
+    distribution.cluster_manager().errorstoignore.return_value = ["cluster error"]
+    distribution.container_engine().errorstoignore.return_value = ["container error"]
+    return Env({"verbose": 0,
+                "distribution": distribution,
+                "nodes": ["node1", "node2", "node3"],
+                "clusters": [["node1", "node2", "node3"]],
+                "config": None,
+                "resumed_setup": resumed})
+
+
+def test_resumed_setup_builds_config():
+    env = make_env(resumed=True)
+    component = SimpleSetup(env)
+    component.rsh = mock.MagicMock()
+    cluster_manager = mock.MagicMock()
+    cluster_manager._ClusterManager__instance_errorstoignore = []
+
+    assert component.SetUp(cluster_manager) == 1
+
+    assert env["config"] is not None
+    assert env["config"]["name"] == "dummy"
+    assert env["config"]["ocf_name"] == "dummy"
+    assert cluster_manager._ClusterManager__instance_errorstoignore == \
+        ["cluster error", "container error"]
+    # the cluster left by the interrupted run is kept as is
+    assert not component.rsh.called
+    assert not component.package_manager.ensure.called
+    assert not component.cluster_manager.create_cluster.called